@@ -0,0 +1,179 @@
+"""
+Contrôle d'admission devant le chemin de scraping.
+  - Limite globale (par processus) du nombre de scrapings simultanés, avec une file d'attente bornée
+    et prioritaire ; au-delà, rejet immédiat (429 + Retry-After).
+  - Seau de jetons par utilisateur (email de session, sinon adresse IP).
+  - Avec la file de travaux, nombre borné de threads web attendant le résultat d'un worker (rejet immédiat au-delà).
+Les requêtes servies par le catalogue local ne prennent pas de place de scraping.
+"""
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+
+PRIORITY_INTERACTIVE = 0  # /search
+PRIORITY_BULK = 1         # /subscribe
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée par le contrôle d'admission ; `retry_after` est exprimé en secondes."""
+
+    def __init__(self, message: str, retry_after: float, status: int = 429):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.status = status
+
+
+#########################
+# Limite globale de scrapings simultanés
+#########################
+class ScrapeGate:
+    """Sémaphore à file d'attente bornée : les tickets de plus haute priorité (valeur la plus basse) passent en premier."""
+
+    def __init__(self, max_concurrent: int, max_waiting: int):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = []  # tas de (priorité, numéro d'ordre)
+        self.sequence = itertools.count()
+        self.avg_duration = config.SCRAPE_TIMEOUT
+        self.rejected = 0
+
+    def _estimated_wait(self) -> float:
+        return self.avg_duration * (len(self.waiting) + 1) / max(1, self.max_concurrent)
+
+    def acquire(self, priority: int, timeout: float) -> None:
+        with self.condition:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                return
+            if len(self.waiting) >= self.max_waiting:
+                self.rejected += 1
+                raise AdmissionRejected("Trop de recherches en cours, réessayez plus tard.", self._estimated_wait())
+            ticket = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, ticket)
+            deadline = time.monotonic() + timeout
+            try:
+                while not (self.waiting[0] == ticket and self.active < self.max_concurrent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise AdmissionRejected("Délai d'attente dépassé, réessayez plus tard.",
+                                                self._estimated_wait(), status=503)
+                    self.condition.wait(remaining)
+                heapq.heappop(self.waiting)
+                self.active += 1
+            except AdmissionRejected:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                raise
+            finally:
+                # Le ticket suivant peut être devenu éligible.
+                self.condition.notify_all()
+
+    def release(self, duration: float) -> None:
+        with self.condition:
+            self.active -= 1
+            # Moyenne mobile exponentielle de la durée d'un scraping, pour estimer Retry-After.
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+            self.condition.notify_all()
+
+    def snapshot(self) -> dict:
+        with self.condition:
+            return {
+                "active": self.active,
+                "waiting": len(self.waiting),
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "avg_duration_s": self.avg_duration,
+                "rejected": self.rejected,
+            }
+
+
+#########################
+# Seaux de jetons par utilisateur
+#########################
+class RateLimiter:
+    """Seaux de jetons par clé, en nombre borné (les clés les moins récemment vues sont oubliées)."""
+
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # clé -> (jetons, date de mise à jour)
+
+    def check(self, key: str, cost: float = 1.0) -> None:
+        """Consomme `cost` jetons pour la clé, ou lève AdmissionRejected."""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        if not allowed:
+            raise AdmissionRejected("Trop de requêtes, ralentissez.", (cost - tokens) / self.rate if self.rate else 60)
+
+
+def gate_limits(web_threads: int, reserved: int, max_concurrent: int, max_waiting: int) -> tuple:
+    """
+    Borne (scrapings simultanés, file d'attente) pour qu'ils n'occupent jamais plus de
+    web_threads - reserved threads : les threads restants peuvent toujours répondre 429 ou depuis le catalogue.
+    """
+    available = max(1, web_threads - reserved)
+    limited_concurrent = max(1, min(max_concurrent, available))
+    limited_waiting = max(0, min(max_waiting, available - limited_concurrent))
+    if (limited_concurrent, limited_waiting) != (max_concurrent, max_waiting):
+        logging.warning("Contrôle d'admission ramené à %d scrapings + %d en attente (%d threads, %d réservés).",
+                        limited_concurrent, limited_waiting, web_threads, reserved)
+    return limited_concurrent, limited_waiting
+
+
+_gate = ScrapeGate(*gate_limits(config.WEB_THREADS, config.ADMISSION_RESERVED_THREADS,
+                                config.ADMISSION_MAX_CONCURRENT, config.ADMISSION_MAX_WAITING))
+# Une recherche confiée aux workers occupe un thread web pendant l'attente, sans scraper : ces attentes
+# peuvent utiliser tous les threads non réservés, sans file d'attente locale.
+_queue_gate = ScrapeGate(max(1, config.WEB_THREADS - config.ADMISSION_RESERVED_THREADS), 0)
+_limiter = RateLimiter(config.RATE_LIMIT_PER_MINUTE, config.RATE_LIMIT_BURST, config.RATE_LIMIT_MAX_KEYS)
+
+
+def check_rate_limit(user_key: str) -> None:
+    """Applique le seau de jetons de l'utilisateur (sans effet si la limite est désactivée)."""
+    if config.RATE_LIMIT_PER_MINUTE > 0:
+        _limiter.check(user_key)
+
+
+@contextmanager
+def _hold(gate: ScrapeGate, priority: int, timeout: float):
+    gate.acquire(priority, timeout)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        gate.release(time.monotonic() - start)
+
+
+def scrape_slot(priority: int = PRIORITY_INTERACTIVE):
+    """Réserve une place de scraping pour la durée du bloc, en attendant au plus ADMISSION_QUEUE_TIMEOUT."""
+    return _hold(_gate, priority, config.ADMISSION_QUEUE_TIMEOUT)
+
+
+def queue_wait_slot(priority: int = PRIORITY_INTERACTIVE):
+    """Réserve une place d'attente d'une recherche confiée aux workers ; lève AdmissionRejected si toutes sont prises."""
+    return _hold(_queue_gate, priority, 0)
+
+
+def snapshot() -> dict:
+    """Retourne l'état courant de la limite de scrapings simultanés (et des attentes de la file de travaux)."""
+    return dict(_gate.snapshot(), queue_waits=_queue_gate.snapshot())
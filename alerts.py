@@ -0,0 +1,96 @@
+"""
+Moteur de règles d'alerte de prix, évalué en une seule requête SQL ensembliste.
+Les derniers prix observés (latest_prices) sont joints aux abonnements via l'index sur product_url :
+un rafraîchissement de prix ne touche que les abonnés du produit concerné.
+"""
+import sqlite3
+import time
+
+import config
+
+# Colonnes de règles ajoutées à la table subscriptions (migration des bases existantes).
+RULE_COLUMNS = {
+    "target_price": "REAL",
+    "min_drop_pct": "REAL NOT NULL DEFAULT {}".format(config.ALERT_DEFAULT_MIN_DROP_PCT),
+    "cooldown_seconds": "INTEGER NOT NULL DEFAULT {}".format(config.ALERT_DEFAULT_COOLDOWN_SECONDS),
+    "last_alert_at": "REAL",
+}
+
+SCHEMA = """
+    CREATE INDEX IF NOT EXISTS idx_subscriptions_product_url ON subscriptions(product_url);
+    CREATE TABLE IF NOT EXISTS latest_prices (
+        product_url TEXT PRIMARY KEY,
+        price REAL NOT NULL,
+        observed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_latest_prices_observed_at ON latest_prices(observed_at);
+"""
+
+# Une alerte se déclenche lorsque le prix observé :
+#   - est inférieur au prix de référence d'au moins min_drop_pct % (0 par défaut si un prix cible est défini),
+#   - atteint le prix cible s'il est défini,
+#   - et que le délai de refroidissement depuis la dernière alerte est écoulé.
+TRIGGERED_SQL = """
+    SELECT s.id, s.email, s.product_url, s.initial_price, lp.price
+    FROM latest_prices lp
+    JOIN subscriptions s ON s.product_url = lp.product_url
+    WHERE {scope}
+      AND lp.price < s.initial_price
+      AND lp.price <= s.initial_price * (1 - s.min_drop_pct / 100.0)
+      AND (s.target_price IS NULL OR lp.price <= s.target_price)
+      AND (s.last_alert_at IS NULL OR s.last_alert_at + s.cooldown_seconds <= ?)
+    ORDER BY s.id
+"""
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Ajoute une colonne ; sans effet si une migration concurrente (autre processus) l'a déjà ajoutée."""
+    try:
+        conn.execute("ALTER TABLE {} ADD COLUMN {} {}".format(table, column, definition))
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Ajoute les colonnes de règles manquantes, l'index product_url et la table des derniers prix."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(subscriptions)")}
+    for column, definition in RULE_COLUMNS.items():
+        if column not in existing:
+            add_column(conn, "subscriptions", column, definition)
+    conn.executescript(SCHEMA)
+
+
+def record_prices(conn: sqlite3.Connection, prices: dict, observed_at: float = None) -> None:
+    """Enregistre les derniers prix observés ({product_url: prix})."""
+    observed_at = time.time() if observed_at is None else observed_at
+    conn.executemany("""
+        INSERT INTO latest_prices (product_url, price, observed_at) VALUES (?, ?, ?)
+        ON CONFLICT(product_url) DO UPDATE SET price = excluded.price, observed_at = excluded.observed_at
+    """, [(url, price, observed_at) for url, price in prices.items() if price != float('inf')])
+
+
+def find_triggered(conn: sqlite3.Connection, since: float = None, product_url: str = None,
+                   product_urls: list = None, now: float = None) -> list:
+    """
+    Retourne les abonnements dont la règle est satisfaite par le dernier prix observé.
+    Le périmètre est restreint aux prix observés depuis `since`, à un produit ou à un lot de produits.
+    Chaque ligne : (id, email, product_url, prix de référence, prix courant).
+    """
+    now = time.time() if now is None else now
+    if product_url is not None:
+        scope, params = "lp.product_url = ?", [product_url]
+    elif product_urls is not None:
+        scope, params = "lp.product_url IN ({})".format(",".join("?" for _ in product_urls)), list(product_urls)
+    elif since is not None:
+        scope, params = "lp.observed_at >= ?", [since]
+    else:
+        scope, params = "1 = 1", []
+    return conn.execute(TRIGGERED_SQL.format(scope=scope), params + [now]).fetchall()
+
+
+def mark_alerted(conn: sqlite3.Connection, alerts: list, now: float = None) -> None:
+    """Réinitialise le prix de référence et la date de dernière alerte des abonnements déclenchés."""
+    now = time.time() if now is None else now
+    conn.executemany("UPDATE subscriptions SET initial_price = ?, last_alert_at = ? WHERE id = ?",
+                     [(current_price, now, sub_id) for sub_id, _, _, _, current_price in alerts])
@@ -4,14 +4,28 @@ import random
 import math
 import smtplib
 import re
-from flask import Flask, jsonify, request, session
+import time
+from urllib.parse import urlencode
+from flask import Flask, Response, g, jsonify, request, session, url_for
 from flask_cors import CORS
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from apscheduler.schedulers.background import BackgroundScheduler
 from concurrent.futures import ThreadPoolExecutor
 import pyrebase
 
+import admission
+import alerts
+import catalog
+import config
+import health
+import hedging
+import image_proxy
+import migrate
+import profiling
+import subscriptions
+import suggest
+import work_queue
+
 # --- Fonctions de scraping
 from scrapers.amazon_scraper import scrape_amazon
 from scrapers.glotehlo_scraper import scrape_glotelho
@@ -34,34 +48,17 @@ firebase_auth = firebase.auth()
 
 # --- Configuration de l'application Flask ---
 app = Flask(__name__)
-app.secret_key = "votre_secret_key"  # À modifier pour la production
+app.secret_key = config.SECRET_KEY  # À définir via SHOPWISE_SECRET_KEY en production
 CORS(app, supports_credentials=True)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-#########################
-# Initialisation de la BDD pour les abonnements
-#########################
-def init_db() -> None:
-    """Initialise la base de données SQLite pour les abonnements."""
-    try:
-        with sqlite3.connect("subscriptions.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_url TEXT,
-                    initial_price REAL,
-                    email TEXT
-                )
-            """)
-            conn.commit()
-        logging.info("Base de données initialisée avec succès.")
-    except Exception as e:
-        logging.error("Erreur lors de l'initialisation de la BDD: %s", e)
-
-
-init_db()
+def create_app() -> Flask:
+    """
+    Retourne l'application Flask pour un processus de service (wsgi.py, serveur de développement).
+    Aucune migration n'est exécutée ici : les schémas sont créés une seule fois par migrate.py.
+    """
+    return app
 
 
 #########################
@@ -72,6 +69,9 @@ def normalize_text(text: str) -> str:
     return re.sub(r'\W+', '', text.lower())
 
 
+suggestions = suggest.SuggestionIndex(normalize_text)
+
+
 def extract_price(price_str: str) -> float:
     """
     Extrait et convertit le prix à partir d'une chaîne.
@@ -102,26 +102,53 @@ def compute_deal_attributes(record: dict) -> dict:
     return record
 
 
+def filter_by_price(records: list, min_price: float = None, max_price: float = None) -> list:
+    """Filtre des résultats formatés selon des bornes de prix optionnelles."""
+    if min_price is None and max_price is None:
+        return records
+    filtered = []
+    for record in records:
+        price = extract_price(record.get("price", ""))
+        if min_price is not None and price < min_price:
+            continue
+        if max_price is not None and price > max_price:
+            continue
+        filtered.append(record)
+    return filtered
+
+
 #########################
 # Fonction de recherche de produits
 #########################
-def do_search(query: str) -> list:
+# Scrapers interrogés par do_search, indexés par le nom de source exposé dans les résultats.
+SCRAPERS = {
+    "Amazon": scrape_amazon,
+    "Glotehlo": scrape_glotelho,
+    "Walmart": scrape_walmart,
+}
+
+
+def do_search(query: str) -> tuple:
     """
     Effectue une recherche de produits à partir d'un mot-clé en utilisant plusieurs scrapers.
-    Retourne une liste de produits filtrés et triés par prix.
+    Les enseignes dont le disjoncteur est ouvert sont ignorées (voir health.py).
+    Retourne (produits filtrés et triés par prix, enseignes ignorées par cette recherche).
     """
     try:
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_amazon = executor.submit(scrape_amazon, query)
-            future_glotehlo = executor.submit(scrape_glotelho, query)
-            future_walmart = executor.submit(scrape_walmart, query)
-            amazon_df = future_amazon.result()
-            glotehlo_records = future_glotehlo.result()
-            walmart_df = future_walmart.result()
-
-        amazon_records = amazon_df.to_dict(orient="records") if (amazon_df is not None and not amazon_df.empty) else []
-        walmart_records = walmart_df.to_dict(orient="records") if (walmart_df is not None and not walmart_df.empty) else []
-        combined_results = amazon_records + glotehlo_records + walmart_records
+        sources = [name for name in SCRAPERS if health.get_tracker(name).allow_search()]
+        skipped = [name for name in SCRAPERS if name not in sources]
+        if skipped:
+            logging.warning("Enseignes ignorées (disjoncteur ouvert) pour '%s' : %s", query, ", ".join(skipped))
+        combined_results = []
+        if sources:
+            with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+                futures = [executor.submit(profiling.bind(SCRAPERS[name]), query) for name in sources]
+                for future in futures:
+                    result = future.result()
+                    if isinstance(result, list):
+                        combined_results.extend(result)
+                    elif result is not None and not result.empty:
+                        combined_results.extend(result.to_dict(orient="records"))
 
         filtered_results = []
         seen_urls = set()
@@ -141,12 +168,97 @@ def do_search(query: str) -> list:
         sorted_results = sorted(filtered_results, key=lambda r: r["numeric_price"])
         for record in sorted_results:
             record.pop("numeric_price", None)
-        return sorted_results
+        # Une recherche partielle alimente le catalogue sans marquer la requête comme fraîche.
+        catalog.index_search_results(query, sorted_results, mark_fresh=not skipped)
+        return sorted_results, skipped
     except Exception as e:
         logging.error("Erreur dans do_search: %s", e)
         raise
 
 
+def search_products(query: str, priority: int = admission.PRIORITY_INTERACTIVE) -> tuple:
+    """
+    Recherche live utilisée par les endpoints, soumise au contrôle d'admission (voir admission.py).
+    Si la file de travaux est activée, la recherche est confiée aux workers sans prendre de place de scraping
+    (l'attente reste bornée, voir admission.queue_wait_slot) : une recherche identique déjà en cours
+    sur n'importe quel nœud est partagée au lieu d'être relancée.
+    Retourne (produits, enseignes ignorées), comme do_search.
+    """
+    if config.WORK_QUEUE_ENABLED:
+        # Ce processus ne scrape pas : la concurrence est bornée par les workers (WORKER_CONCURRENCY).
+        with admission.queue_wait_slot(priority):
+            return _search_via_queue(query)
+    with admission.scrape_slot(priority):
+        return do_search(query)
+
+
+def _search_via_queue(query: str) -> tuple:
+    queue = work_queue.get_queue()
+    try:
+        # Une recherche que personne n'attend plus n'est pas exécutée (expiration au-delà du délai d'attente).
+        job_id = queue.enqueue("search", {"query": query}, dedup_key="search:" + catalog.normalize_query(query),
+                               ttl=config.WORK_QUEUE_SEARCH_WAIT_SECONDS,
+                               max_pending=config.WORK_QUEUE_MAX_PENDING_SEARCHES)
+    except work_queue.QueueFull as e:
+        raise admission.AdmissionRejected("Trop de recherches en attente, réessayez plus tard.", config.SCRAPE_TIMEOUT) from e
+    job = queue.wait(job_id, timeout=config.WORK_QUEUE_SEARCH_WAIT_SECONDS, poll_interval=config.WORK_QUEUE_POLL_SECONDS)
+    if job is not None and job.status == work_queue.DONE:
+        # Les disjoncteurs vivent dans les workers : leurs signalements alimentent /health.
+        health.report_degraded(job.result["degraded"])
+        return job.result["results"], job.result["degraded"]
+    if job is not None and job.status == work_queue.FAILED:
+        raise RuntimeError("La recherche a échoué : {}".format(job.error))
+    raise TimeoutError("Aucun worker n'a terminé la recherche '{}' à temps.".format(query))
+
+
+#########################
+# Profilage à la demande de /search (voir profiling.py)
+#########################
+@app.before_request
+def start_profiling():
+    """Démarre le profilage d'un appel à /search s'il est échantillonné ou demandé par un administrateur."""
+    if request.endpoint == "search" and profiling.should_profile(request.headers.get("X-Profile")):
+        g.profiler = profiling.start("search")
+
+
+@app.after_request
+def stop_profiling(response):
+    """Arrête le profilage et indique l'identifiant du profil dans l'en-tête X-Profile-Id."""
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profile_id = profiler.stop()
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+@app.teardown_request
+def discard_profiling(exc):
+    """Arrête un profilage resté actif si la requête s'est terminée sur une exception."""
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+
+#########################
+# Contrôle d'admission : réponses de rejet
+#########################
+def rate_limit_key() -> str:
+    """Clé de limitation de débit : email de session, sinon adresse IP du client."""
+    email = session.get("email")
+    return "email:" + email if email else "ip:" + (request.remote_addr or "inconnue")
+
+
+@app.errorhandler(admission.AdmissionRejected)
+def admission_rejected(e):
+    """Répond 429 (ou 503 après attente) avec un en-tête Retry-After."""
+    logging.warning("Requête rejetée par le contrôle d'admission (%s) : %s", rate_limit_key(), e)
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
 #########################
 # Endpoints d'authentification
 #########################
@@ -231,20 +343,128 @@ def search():
     """
     Recherche des produits selon un mot-clé.
     Stocke la requête dans la session pour usage ultérieur dans /subscribe.
+    Paramètres optionnels :
+      - mode=index : répond depuis le catalogue local (classement BM25) et ne scrape
+        que si l'index est périmé ou contient trop peu de résultats,
+      - min_price / max_price : bornes de prix en FCFA.
+    La provenance des résultats est indiquée dans l'en-tête X-Search-Source (index ou live),
+    et les enseignes ignorées par cette recherche live dans l'en-tête X-Degraded-Sources.
+    Les réponses servies par le catalogue ne consomment ni place de scraping ni jeton de limite de débit ;
+    en surcharge, la recherche live est remplacée par les résultats du catalogue s'il en a,
+    sinon rejetée avec 429 et Retry-After.
     """
     query = request.args.get("query")
     if not query:
         return jsonify({"error": "Veuillez fournir un mot-clé via le paramètre 'query'."}), 400
+    mode = request.args.get("mode", "live")
+    min_price = request.args.get("min_price", type=float)
+    max_price = request.args.get("max_price", type=float)
     session["last_search_query"] = query
     try:
-        results = do_search(query)
-        logging.info("Recherche '%s' retournant %d résultats.", query, len(results))
-        return jsonify(results)
+        results = None
+        degraded = []
+        source = "index"
+        if mode == "index":
+            results = catalog.search_or_none(query, min_price=min_price, max_price=max_price)
+        if results is None:
+            try:
+                admission.check_rate_limit(rate_limit_key())
+                results, degraded = search_products(query)
+                source = "live"
+                results = filter_by_price(results, min_price, max_price)
+            except admission.AdmissionRejected:
+                # Mieux vaut des résultats du catalogue, même incomplets, qu'un rejet.
+                results = catalog.search(query, min_price=min_price, max_price=max_price)
+                if not results:
+                    raise
+                logging.warning("Recherche live '%s' rejetée, réponse depuis le catalogue.", query)
+        logging.info("Recherche '%s' (%s) retournant %d résultats.", query, source, len(results))
+        suggestions.record_query(query)
+        if config.IMAGE_PROXY_ENABLED:
+            results = [image_proxy.rewrite_record(record, proxy_image_url) for record in results]
+        response = jsonify(results)
+        response.headers["X-Search-Source"] = source
+        if degraded:
+            response.headers["X-Degraded-Sources"] = ",".join(degraded)
+        return response
+    except admission.AdmissionRejected:
+        raise
     except Exception as e:
         logging.error("Erreur dans /search: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+#########################
+# Endpoint /suggest : Autocomplétion des requêtes
+#########################
+@app.route('/suggest', methods=['GET'])
+def suggest_queries():
+    """
+    Suggère des requêtes populaires commençant par le préfixe saisi.
+    Paramètres : q (préfixe), limit (nombre de suggestions, 20 au maximum).
+    """
+    prefix = request.args.get("q", "")
+    limit = max(1, min(request.args.get("limit", default=config.SUGGEST_DEFAULT_LIMIT, type=int), 20))
+    response = jsonify(suggestions.suggest(prefix, limit))
+    response.headers["Cache-Control"] = "public, max-age={}".format(config.SUGGEST_REFRESH_SECONDS)
+    return response
+
+
+#########################
+# Endpoint /img : Proxy d'images et miniatures
+#########################
+def proxy_image_url(url: str, width: int) -> str:
+    """Construit l'URL du proxy d'images pour une image distante."""
+    if config.IMAGE_PROXY_BASE_URL:
+        return "{}?{}".format(config.IMAGE_PROXY_BASE_URL, urlencode({"url": url, "w": width}))
+    return url_for("image", url=url, w=width, _external=True)
+
+
+@app.route('/img', methods=['GET'])
+def image():
+    """
+    Sert une miniature WebP/JPEG d'une image d'enseigne, depuis le cache disque.
+    Paramètres : url (image distante), w (largeur souhaitée en pixels).
+    """
+    url = request.args.get("url")
+    if not url:
+        return jsonify({"error": "Veuillez fournir l'URL de l'image via le paramètre 'url'."}), 400
+    width = request.args.get("w", default=config.IMAGE_PROXY_THUMB_WIDTH, type=int)
+    fmt = image_proxy.choose_format(request.headers.get("Accept"))
+    try:
+        data, mimetype, digest = image_proxy.get_thumbnail(url, width, fmt)
+    except image_proxy.ImageProxyError as e:
+        logging.error("Erreur du proxy d'images pour '%s': %s", url, e)
+        return jsonify({"error": str(e)}), e.status
+    if digest in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(data, mimetype=mimetype)
+    response.set_etag(digest)
+    response.headers["Cache-Control"] = "public, max-age={}, immutable".format(config.IMAGE_PROXY_CACHE_SECONDS)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+#########################
+# Endpoint /health : État des enseignes
+#########################
+@app.route('/health', methods=['GET'])
+def retailers_health():
+    """
+    Retourne l'état du disjoncteur, les statistiques glissantes et de couverture de chaque enseigne,
+    ainsi que l'occupation du contrôle d'admission.
+    Avec la file de travaux activée, le scraping a lieu dans les workers : les statistiques locales
+    restent vides et "degraded" reprend les enseignes ignorées qu'ils ont récemment signalées.
+    """
+    return jsonify({
+        "degraded": health.degraded_sources(),
+        "sources": health.snapshot(),
+        "hedging": hedging.snapshot(),
+        "admission": admission.snapshot(),
+    })
+
+
 #########################
 # Endpoint /subscribe : Abonnement aux produits de la dernière recherche
 #########################
@@ -254,7 +474,12 @@ def subscribe():
     Enregistre un abonnement pour un query donné.
     Nécessite que l'email soit présent dans la session (login requis)
     et que le query soit envoyé dans le corps de la requête.
-    Exemple du corps JSON : {"query": "macbook"}
+    Règles d'alerte optionnelles :
+      - target_price : prix cible (FCFA) à atteindre,
+      - min_drop_pct : baisse minimale en % par rapport au prix de référence
+        (SHOPWISE_ALERT_DEFAULT_MIN_DROP_PCT par défaut, aucune si un prix cible est fourni),
+      - cooldown_hours : délai minimal entre deux alertes.
+    Exemple du corps JSON : {"query": "macbook", "target_price": 450000, "min_drop_pct": 10}
     """
     data = request.get_json()
     query = data.get("query") if data else None
@@ -262,27 +487,142 @@ def subscribe():
     if not query or not email:
         return jsonify({"error": "L'email en session et le query en paramètre sont requis (login et query requis)."}), 400
     try:
-        results = do_search(query)
+        target_price = data.get("target_price")
+        target_price = float(target_price) if target_price is not None else None
+        # Un prix cible suffit à lui seul : la baisse minimale par défaut ne s'y ajoute pas.
+        default_min_drop_pct = 0.0 if target_price is not None else config.ALERT_DEFAULT_MIN_DROP_PCT
+        min_drop_pct = float(data.get("min_drop_pct", default_min_drop_pct))
+        cooldown_hours = data.get("cooldown_hours")
+        cooldown_seconds = (int(float(cooldown_hours) * 3600) if cooldown_hours is not None
+                            else config.ALERT_DEFAULT_COOLDOWN_SECONDS)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Les paramètres 'target_price', 'min_drop_pct' et 'cooldown_hours' doivent être numériques."}), 400
+    if (target_price is not None and target_price <= 0) or not 0 <= min_drop_pct < 100 or cooldown_seconds < 0:
+        return jsonify({"error": "Règle d'alerte invalide (prix cible positif, baisse entre 0 et 100 %, délai positif)."}), 400
+    admission.check_rate_limit(rate_limit_key())
+    try:
+        results, _ = search_products(query, priority=admission.PRIORITY_BULK)
         if not results:
             return jsonify({"message": "Aucun produit trouvé pour la requête."}), 404
 
-        with sqlite3.connect("subscriptions.db") as conn:
+        with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
             cursor = conn.cursor()
             count = 0
             for record in results:
                 product_url = record.get("productURL", "").strip()
                 initial_price = extract_price(record.get("price", ""))
                 if product_url and initial_price != float('inf'):
-                    cursor.execute("INSERT INTO subscriptions (product_url, initial_price, email) VALUES (?, ?, ?)",
-                                   (product_url, initial_price, email))
+                    cursor.execute("""
+                        INSERT INTO subscriptions (product_url, initial_price, email, target_price, min_drop_pct,
+                                                   cooldown_seconds, retailer)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (product_url, initial_price, email, target_price, min_drop_pct, cooldown_seconds,
+                          record.get("source")))
                     count += 1
             conn.commit()
         logging.info("Abonnement enregistré pour le query '%s' pour %s (%d produits).", query, email, count)
         return jsonify({"message": f"Abonnement enregistré pour {count} produits.", "count": count})
+    except admission.AdmissionRejected:
+        raise
     except Exception as e:
         logging.error("Erreur dans /subscribe: %s", e)
         return jsonify({"error": str(e)}), 500
 
+#########################
+# Endpoints /subscriptions : Consultation et suppression des abonnements
+#########################
+def format_subscription(subscription: dict) -> dict:
+    """Formate les prix d'un abonnement pour la réponse JSON."""
+    for field in ("initial_price", "current_price", "target_price"):
+        if subscription[field] is not None:
+            subscription[field] = format_price(subscription[field])
+    return subscription
+
+
+@app.route('/subscriptions', methods=['GET'])
+def list_subscriptions():
+    """
+    Liste les abonnements de l'utilisateur connecté, du plus récent au plus ancien.
+    Paramètres optionnels : cursor (valeur next_cursor de la page précédente), limit (200 au maximum),
+    retailer (Amazon, Walmart, Glotehlo), status (dropped ou not_dropped).
+    """
+    email = session.get("email")
+    if not email:
+        return jsonify({"error": "Connexion requise."}), 401
+    try:
+        with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+            items, next_cursor = subscriptions.list_page(
+                conn, email,
+                cursor=request.args.get("cursor", type=int),
+                limit=request.args.get("limit", default=50, type=int),
+                retailer=request.args.get("retailer"),
+                status=request.args.get("status"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error("Erreur dans /subscriptions: %s", e)
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"subscriptions": [format_subscription(item) for item in items], "next_cursor": next_cursor})
+
+
+@app.route('/subscriptions/<int:sub_id>', methods=['GET', 'DELETE'])
+def manage_subscription(sub_id: int):
+    """Consulte (GET) ou supprime (DELETE) un abonnement de l'utilisateur connecté."""
+    email = session.get("email")
+    if not email:
+        return jsonify({"error": "Connexion requise."}), 401
+    try:
+        with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+            if request.method == "GET":
+                subscription = subscriptions.get(conn, email, sub_id)
+                if subscription is None:
+                    return jsonify({"error": "Abonnement introuvable."}), 404
+                return jsonify(format_subscription(subscription))
+            deleted = subscriptions.delete(conn, email, [sub_id])
+            conn.commit()
+    except Exception as e:
+        logging.error("Erreur dans /subscriptions/%s: %s", sub_id, e)
+        return jsonify({"error": str(e)}), 500
+    if not deleted:
+        return jsonify({"error": "Abonnement introuvable."}), 404
+    logging.info("Abonnement %d supprimé pour %s.", sub_id, email)
+    return jsonify({"message": "Abonnement supprimé.", "deleted": deleted})
+
+
+@app.route('/subscriptions/bulk_delete', methods=['POST'])
+def bulk_delete_subscriptions():
+    """
+    Supprime plusieurs abonnements de l'utilisateur connecté.
+    Corps JSON : {"ids": [1, 2, 3]} ou des filtres {"retailer": "Amazon", "status": "not_dropped"}.
+    """
+    email = session.get("email")
+    if not email:
+        return jsonify({"error": "Connexion requise."}), 401
+    data = request.get_json() or {}
+    ids = data.get("ids")
+    retailer = data.get("retailer")
+    status = data.get("status")
+    if ids is None and not retailer and not status:
+        return jsonify({"error": "Fournissez 'ids' ou au moins un filtre ('retailer', 'status')."}), 400
+    if ids is not None and (not isinstance(ids, list) or len(ids) > 1000
+                            or not all(isinstance(sub_id, int) for sub_id in ids)):
+        return jsonify({"error": "'ids' doit être une liste d'au plus 1000 identifiants entiers."}), 400
+    try:
+        with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+            if ids is not None:
+                deleted = subscriptions.delete(conn, email, ids)
+            else:
+                deleted = subscriptions.delete_matching(conn, email, retailer=retailer, status=status)
+            conn.commit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error("Erreur dans /subscriptions/bulk_delete: %s", e)
+        return jsonify({"error": str(e)}), 500
+    logging.info("%d abonnements supprimés pour %s.", deleted, email)
+    return jsonify({"message": f"{deleted} abonnements supprimés.", "deleted": deleted})
+
+
 #########################
 # Fonction de simulation du prix actuel d'un produit
 #########################
@@ -333,62 +673,103 @@ def send_email_alert(email: str, product_url: str, current_price: float) -> None
 #########################
 # Fonction de vérification des prix et mise à jour des abonnements
 #########################
-def run_price_check() -> list:
+def run_price_check(product_urls: list = None) -> list:
+    """
+    Vérifie les prix des produits abonnés (voir _run_price_check).
+    Une fraction des exécutions est profilée (SHOPWISE_PROFILE_PRICE_CHECK_SAMPLE_RATE).
+    """
+    if not profiling.should_profile(sample_rate=config.PROFILE_PRICE_CHECK_SAMPLE_RATE):
+        return _run_price_check(product_urls)
+    profiler = profiling.start("price_check")
+    try:
+        return _run_price_check(product_urls)
+    finally:
+        profiler.stop()
+
+
+def _run_price_check(product_urls: list = None) -> list:
     """
-    Vérifie si le prix des produits abonnés a baissé.
-    Envoie un email d'alerte et met à jour la BDD pour chaque produit concerné.
+    Rafraîchit le prix de chaque produit abonné (ou du lot `product_urls`), puis évalue les règles
+    d'alerte en une seule requête SQL (voir alerts.py).
+    Les alertes déclenchées sont réservées (last_alert_at) et validées en une courte transaction,
+    puis les emails sont envoyés hors transaction : l'envoi SMTP ne bloque pas la base, et un lot
+    retenté ne renvoie pas les alertes déjà réservées.
     Retourne la liste des alertes déclenchées.
+    Un lot en erreur lève l'exception, pour que la file de travaux le retente (voir worker.py).
     """
+    batch = product_urls is not None
     try:
-        with sqlite3.connect("subscriptions.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, product_url, initial_price, email FROM subscriptions")
-            subscriptions = cursor.fetchall()
-            alerts_triggered = []
-            for sub in subscriptions:
-                sub_id, product_url, baseline_price, email = sub
-                current_price = get_current_price(product_url)
-                if current_price < baseline_price:
-                    send_email_alert(email, product_url, current_price)
-                    alerts_triggered.append({
-                        "subscription_id": sub_id,
-                        "email": email,
-                        "product_url": product_url,
-                        "current_price": format_price(current_price),
-                        "previous_price": format_price(baseline_price)
-                    })
-                    cursor.execute("UPDATE subscriptions SET initial_price = ? WHERE id = ?", (current_price, sub_id))
+        if not batch:
+            with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+                product_urls = [row[0] for row in conn.execute("SELECT DISTINCT product_url FROM subscriptions")]
+        refresh_started = time.time()
+        prices = {url: get_current_price(url) for url in product_urls}
+        with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+            alerts.record_prices(conn, prices, refresh_started)
+            # Un lot ne doit évaluer que ses propres produits : d'autres workers rafraîchissent les autres lots.
+            if batch:
+                triggered = alerts.find_triggered(conn, product_urls=product_urls)
+            else:
+                triggered = alerts.find_triggered(conn, since=refresh_started)
+            alerts.mark_alerted(conn, triggered)
             conn.commit()
-        logging.info("Vérification terminée. Alertes déclenchées : %s", alerts_triggered)
+        alerts_triggered = []
+        for sub_id, email, product_url, baseline_price, current_price in triggered:
+            send_email_alert(email, product_url, current_price)
+            alerts_triggered.append({
+                "subscription_id": sub_id,
+                "email": email,
+                "product_url": product_url,
+                "current_price": format_price(current_price),
+                "previous_price": format_price(baseline_price)
+            })
+        logging.info("Vérification terminée (%d produits). Alertes déclenchées : %s", len(product_urls), alerts_triggered)
         return alerts_triggered
     except Exception as e:
         logging.error("Erreur lors de la vérification des prix: %s", e)
+        if batch:
+            raise
         return []
 
 
+def enqueue_price_checks() -> int:
+    """
+    Découpe la vérification des prix en lots de produits confiés aux workers via la file de travaux.
+    Un lot encore en cours depuis la vérification précédente n'est pas dupliqué.
+    Retourne le nombre de lots soumis.
+    """
+    with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+        product_urls = [row[0] for row in conn.execute("SELECT DISTINCT product_url FROM subscriptions ORDER BY product_url")]
+    queue = work_queue.get_queue()
+    batches = 0
+    for start in range(0, len(product_urls), config.PRICE_CHECK_BATCH_SIZE):
+        batch = product_urls[start:start + config.PRICE_CHECK_BATCH_SIZE]
+        queue.enqueue("price_check", {"product_urls": batch}, dedup_key="price_check:{}".format(batch[0]))
+        batches += 1
+    logging.info("Vérification des prix : %d produits répartis en %d lots.", len(product_urls), batches)
+    return batches
+
+
 @app.route('/check_prices', methods=['GET'])
 def check_prices():
     """
     Endpoint manuel pour vérifier les prix des produits abonnés.
     Retourne un message et la liste des articles dont le prix a changé.
     """
-    alerts = run_price_check()
-    if alerts is None:
+    triggered = run_price_check()
+    if triggered is None:
         return jsonify({"error": "Erreur lors de la vérification des prix."}), 500
     return jsonify({
         "message": "Vérification manuelle effectuée. Consultez les logs pour plus d'informations.",
-        "alerts_triggered": alerts
+        "alerts_triggered": triggered
     })
 
 
 #########################
-# Lancement de l'application et du job planifié
+# Lancement du serveur de développement
+# En production : gunicorn -c gunicorn.conf.py wsgi:application
+# Le job planifié tourne dans son propre processus : python scheduler.py
 #########################
 if __name__ == "__main__":
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(func=run_price_check, trigger="interval", hours=2)
-    scheduler.start()
-    try:
-        app.run(debug=True, host="0.0.0.0", port=5000)
-    except (KeyboardInterrupt, SystemExit):
-        scheduler.shutdown()
+    migrate.run()
+    create_app().run(debug=config.DEBUG, host=config.HOST, port=config.PORT)
@@ -0,0 +1,308 @@
+"""
+Catalogue local des produits scrapés, indexé en plein texte (SQLite FTS5).
+Chaque recherche live alimente le catalogue ; /search?mode=index y répond sans scraping
+tant que l'index est frais et contient assez de résultats.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+
+import config
+
+
+#########################
+# Schéma et initialisation
+#########################
+# Un changement de prix seul ne doit pas réindexer le texte du produit.
+UPDATE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF description, retailer ON products
+    WHEN old.description IS NOT new.description OR old.retailer IS NOT new.retailer
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description, retailer)
+        VALUES ('delete', old.id, old.description, old.retailer);
+        INSERT INTO products_fts(rowid, description, retailer)
+        VALUES (new.id, new.description, new.retailer);
+    END;
+"""
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_url TEXT NOT NULL UNIQUE,
+        description TEXT,
+        price REAL,
+        retailer TEXT,
+        record TEXT,
+        content_hash TEXT,
+        updated_at REAL,
+        last_seen REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_products_price ON products(price);
+    CREATE INDEX IF NOT EXISTS idx_products_last_seen ON products(last_seen);
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        description, retailer,
+        content='products', content_rowid='id'
+    );
+
+    -- L'index FTS n'est touché que lorsque le texte indexé change réellement.
+    CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, description, retailer)
+        VALUES (new.id, new.description, new.retailer);
+    END;
+    CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description, retailer)
+        VALUES ('delete', old.id, old.description, old.retailer);
+    END;
+""" + UPDATE_TRIGGER + """
+    CREATE TABLE IF NOT EXISTS catalog_queries (
+        query TEXT PRIMARY KEY,
+        last_scraped REAL,
+        result_count INTEGER
+    );
+
+    -- Fréquence des recherches (clé normalisée par normalize_text), avec décroissance périodique.
+    CREATE TABLE IF NOT EXISTS query_stats (
+        query_key TEXT PRIMARY KEY,
+        display TEXT NOT NULL,
+        hits REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_query_stats_hits ON query_stats(hits);
+
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        key TEXT PRIMARY KEY,
+        value REAL
+    );
+"""
+
+
+def connect() -> sqlite3.Connection:
+    """Ouvre une connexion au catalogue (partagée entre workers via le mode WAL)."""
+    conn = sqlite3.connect(config.CATALOG_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def init_catalog() -> None:
+    """Crée les tables, l'index plein texte et les triggers de maintenance incrémentale."""
+    try:
+        with connect() as conn:
+            conn.executescript(SCHEMA)
+            _upgrade_update_trigger(conn)
+        logging.info("Catalogue local initialisé avec succès.")
+    except Exception as e:
+        logging.error("Erreur lors de l'initialisation du catalogue: %s", e)
+
+
+def _upgrade_update_trigger(conn: sqlite3.Connection) -> None:
+    """Remplace le trigger de mise à jour des catalogues créés sans clause WHEN."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'products_au'").fetchone()
+    if row and "WHEN" not in row[0].upper():
+        conn.executescript("BEGIN; DROP TRIGGER products_au; " + UPDATE_TRIGGER + " COMMIT;")
+        logging.info("Trigger products_au du catalogue mis à jour.")
+
+
+#########################
+# Fonctions utilitaires
+#########################
+def normalize_query(query: str) -> str:
+    """Normalise une requête pour le suivi de fraîcheur (minuscules, espaces compactés)."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def build_match_expression(query: str) -> str:
+    """
+    Construit une expression MATCH FTS5 à partir d'une requête utilisateur.
+    Chaque mot est mis entre guillemets pour neutraliser la syntaxe FTS5 ; tous les mots sont requis.
+    """
+    tokens = re.findall(r"\w+", query.lower())
+    return " ".join('"{}"'.format(token) for token in tokens)
+
+
+def _parse_price(price_str: str) -> float:
+    """Convertit un prix formaté ("1,234.00 FCFA") en nombre, ou None si impossible."""
+    try:
+        return float(str(price_str).replace(" FCFA", "").replace(",", "").replace(" ", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+#########################
+# Alimentation incrémentale
+#########################
+def upsert_products(records: list) -> int:
+    """
+    Insère ou met à jour les produits scrapés dans le catalogue.
+    Un produit inchangé (même empreinte) ne met à jour que sa date de dernière observation,
+    sans toucher l'index plein texte. Retourne le nombre de produits ajoutés ou modifiés.
+    """
+    now = time.time()
+    changed = 0
+    with connect() as conn:
+        cursor = conn.cursor()
+        for record in records:
+            product_url = (record.get("productURL") or "").strip()
+            if not product_url or product_url == "N/A":
+                continue
+            payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+            content_hash = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+            cursor.execute(
+                "UPDATE products SET last_seen = ? WHERE product_url = ? AND content_hash = ?",
+                (now, product_url, content_hash))
+            if cursor.rowcount:
+                continue
+            cursor.execute("""
+                INSERT INTO products (product_url, description, price, retailer, record, content_hash, updated_at, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(product_url) DO UPDATE SET
+                    description = excluded.description,
+                    price = excluded.price,
+                    retailer = excluded.retailer,
+                    record = excluded.record,
+                    content_hash = excluded.content_hash,
+                    updated_at = excluded.updated_at,
+                    last_seen = excluded.last_seen
+            """, (product_url, record.get("description"), _parse_price(record.get("price")),
+                  record.get("source"), payload, content_hash, now, now))
+            changed += 1
+        conn.commit()
+    return changed
+
+
+def record_query(query: str, result_count: int) -> None:
+    """Mémorise la date du dernier scraping live d'une requête."""
+    with connect() as conn:
+        conn.execute("""
+            INSERT INTO catalog_queries (query, last_scraped, result_count) VALUES (?, ?, ?)
+            ON CONFLICT(query) DO UPDATE SET
+                last_scraped = excluded.last_scraped,
+                result_count = excluded.result_count
+        """, (normalize_query(query), time.time(), result_count))
+        conn.commit()
+
+
+def index_search_results(query: str, records: list, mark_fresh: bool = True) -> None:
+    """
+    Enregistre les résultats d'une recherche live dans le catalogue, sans jamais lever d'exception.
+    Avec mark_fresh=False (recherche partielle), la requête n'est pas considérée comme fraîche.
+    """
+    try:
+        changed = upsert_products(records)
+        if mark_fresh:
+            record_query(query, len(records))
+        logging.info("Catalogue mis à jour pour '%s' : %d produits modifiés sur %d.", query, changed, len(records))
+    except Exception as e:
+        logging.error("Erreur lors de la mise à jour du catalogue pour '%s': %s", query, e)
+
+
+#########################
+# Interrogation de l'index
+#########################
+def is_fresh(query: str, max_age: int = None) -> bool:
+    """Indique si la requête a été scrapée récemment."""
+    max_age = config.CATALOG_MAX_AGE if max_age is None else max_age
+    with connect() as conn:
+        row = conn.execute("SELECT last_scraped FROM catalog_queries WHERE query = ?",
+                           (normalize_query(query),)).fetchone()
+    return bool(row) and row[0] >= time.time() - max_age
+
+
+def search(query: str, min_price: float = None, max_price: float = None,
+           limit: int = None, max_age: int = None) -> list:
+    """
+    Recherche des produits dans le catalogue local.
+    Les résultats sont classés par pertinence BM25 et filtrés par prix et par fraîcheur.
+    """
+    expression = build_match_expression(query)
+    if not expression:
+        return []
+    limit = config.CATALOG_MAX_RESULTS if limit is None else limit
+    max_age = config.CATALOG_MAX_AGE if max_age is None else max_age
+    sql = """
+        SELECT p.record FROM products_fts
+        JOIN products p ON p.id = products_fts.rowid
+        WHERE products_fts MATCH ? AND p.last_seen >= ?
+    """
+    params = [expression, time.time() - max_age]
+    if min_price is not None:
+        sql += " AND p.price >= ?"
+        params.append(min_price)
+    if max_price is not None:
+        sql += " AND p.price <= ?"
+        params.append(max_price)
+    sql += " ORDER BY bm25(products_fts) LIMIT ?"
+    params.append(limit)
+    with connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def search_or_none(query: str, min_price: float = None, max_price: float = None) -> list:
+    """
+    Répond depuis l'index si la requête est fraîche et a suffisamment de correspondances.
+    Retourne None lorsqu'un scraping live est nécessaire.
+    """
+    try:
+        if not is_fresh(query):
+            return None
+        results = search(query, min_price=min_price, max_price=max_price)
+        if len(results) < config.CATALOG_MIN_RESULTS:
+            return None
+        return results
+    except Exception as e:
+        logging.error("Erreur lors de la recherche dans le catalogue pour '%s': %s", query, e)
+        return None
+
+
+#########################
+# Statistiques de recherche (autocomplétion, voir suggest.py)
+#########################
+def record_search(query_key: str, display: str) -> None:
+    """Incrémente la fréquence d'une requête normalisée."""
+    with connect() as conn:
+        conn.execute("""
+            INSERT INTO query_stats (query_key, display, hits, updated_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(query_key) DO UPDATE SET
+                display = excluded.display,
+                hits = hits + 1,
+                updated_at = excluded.updated_at
+        """, (query_key, display, time.time()))
+        conn.commit()
+
+
+def top_searches(limit: int) -> list:
+    """Retourne les requêtes les plus fréquentes : [(clé, affichage, fréquence)]."""
+    with connect() as conn:
+        return conn.execute("SELECT query_key, display, hits FROM query_stats ORDER BY hits DESC LIMIT ?",
+                            (limit,)).fetchall()
+
+
+def recent_descriptions(limit: int) -> list:
+    """Retourne les descriptions des produits vus le plus récemment."""
+    with connect() as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT description FROM products WHERE description IS NOT NULL ORDER BY last_seen DESC LIMIT ?",
+            (limit,))]
+
+
+def decay_searches(factor: float, min_hits: float, interval: float) -> bool:
+    """
+    Applique la décroissance des fréquences si elle n'a pas eu lieu depuis `interval` secondes.
+    Un seul processus l'applique par période ; les requêtes devenues rares sont supprimées.
+    Retourne True si la décroissance a été appliquée.
+    """
+    now = time.time()
+    with connect() as conn:
+        conn.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('last_decay', ?)", (now,))
+        claimed = conn.execute("UPDATE catalog_meta SET value = ? WHERE key = 'last_decay' AND value <= ?",
+                               (now, now - interval)).rowcount
+        if claimed:
+            conn.execute("UPDATE query_stats SET hits = hits * ?", (factor,))
+            conn.execute("DELETE FROM query_stats WHERE hits < ?", (min_hits,))
+        conn.commit()
+    return bool(claimed)
@@ -0,0 +1,203 @@
+"""
+Configuration centralisée de ShopWise.
+Toutes les valeurs peuvent être surchargées par des variables d'environnement préfixées par SHOPWISE_.
+"""
+import os
+import socket
+
+
+def _env_int(name: str, default: int) -> int:
+    """Lit un entier depuis l'environnement, avec une valeur par défaut."""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Lit un flottant depuis l'environnement, avec une valeur par défaut."""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Lit un booléen depuis l'environnement ("1", "true", "yes", "on")."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+#########################
+# Application Flask
+#########################
+SECRET_KEY = os.environ.get("SHOPWISE_SECRET_KEY", "votre_secret_key")
+DEBUG = _env_bool("SHOPWISE_DEBUG", False)
+HOST = os.environ.get("SHOPWISE_HOST", "0.0.0.0")
+PORT = _env_int("SHOPWISE_PORT", 5000)
+
+#########################
+# Bases de données
+#########################
+SUBSCRIPTIONS_DB = os.environ.get("SHOPWISE_SUBSCRIPTIONS_DB", "subscriptions.db")
+CATALOG_DB = os.environ.get("SHOPWISE_CATALOG_DB", "catalog.db")
+
+#########################
+# Serveur de production (gunicorn, worker "gthread")
+# Le scraping est dominé par les I/O réseau : peu de processus, beaucoup de threads.
+#########################
+WEB_WORKERS = _env_int("SHOPWISE_WEB_WORKERS", max(2, min(os.cpu_count() or 1, 4)))
+WEB_THREADS = _env_int("SHOPWISE_WEB_THREADS", 8)
+# Une recherche peut enchaîner plusieurs tentatives de 10 s chez Amazon.
+WEB_TIMEOUT = _env_int("SHOPWISE_WEB_TIMEOUT", 120)
+# Délai laissé aux requêtes en cours pour se terminer lors d'un arrêt (SIGTERM).
+WEB_GRACEFUL_TIMEOUT = _env_int("SHOPWISE_WEB_GRACEFUL_TIMEOUT", 60)
+WEB_KEEPALIVE = _env_int("SHOPWISE_WEB_KEEPALIVE", 5)
+# Recyclage périodique des workers pour contenir la mémoire des arbres BeautifulSoup.
+WEB_MAX_REQUESTS = _env_int("SHOPWISE_WEB_MAX_REQUESTS", 1000)
+WEB_MAX_REQUESTS_JITTER = _env_int("SHOPWISE_WEB_MAX_REQUESTS_JITTER", 100)
+
+#########################
+# Job planifié de vérification des prix (processus dédié, voir scheduler.py)
+#########################
+PRICE_CHECK_INTERVAL_HOURS = _env_float("SHOPWISE_PRICE_CHECK_INTERVAL_HOURS", 2.0)
+
+#########################
+# Catalogue local indexé (voir catalog.py)
+#########################
+# Âge maximal (en secondes) d'un produit ou d'une requête avant de considérer l'index comme périmé.
+CATALOG_MAX_AGE = _env_int("SHOPWISE_CATALOG_MAX_AGE", 6 * 3600)
+# Nombre minimal de résultats indexés pour répondre sans scraping.
+CATALOG_MIN_RESULTS = _env_int("SHOPWISE_CATALOG_MIN_RESULTS", 10)
+CATALOG_MAX_RESULTS = _env_int("SHOPWISE_CATALOG_MAX_RESULTS", 200)
+
+#########################
+# Suivi de santé et disjoncteur par enseigne (voir health.py)
+#########################
+# Taille de la fenêtre glissante (nombre de requêtes ou de pages observées).
+HEALTH_WINDOW = _env_int("SHOPWISE_HEALTH_WINDOW", 20)
+# Nombre minimal d'observations avant de pouvoir ouvrir le disjoncteur.
+HEALTH_MIN_SAMPLES = _env_int("SHOPWISE_HEALTH_MIN_SAMPLES", 5)
+HEALTH_MAX_ERROR_RATE = _env_float("SHOPWISE_HEALTH_MAX_ERROR_RATE", 0.5)
+HEALTH_MAX_EMPTY_RATE = _env_float("SHOPWISE_HEALTH_MAX_EMPTY_RATE", 0.8)
+# Durée d'ouverture du disjoncteur avant l'envoi d'une sonde.
+HEALTH_OPEN_SECONDS = _env_int("SHOPWISE_HEALTH_OPEN_SECONDS", 60)
+# Timeout des requêtes HTTP vers les enseignes.
+SCRAPE_TIMEOUT = _env_float("SHOPWISE_SCRAPE_TIMEOUT", 10.0)
+
+#########################
+# Analyse HTML des pages de résultats
+#########################
+# Mode basse mémoire : seuls les conteneurs de résultats sont construits (SoupStrainer),
+# extraits dans le thread de récupération puis détruits avant d'être rendus à la boucle de collecte.
+LOW_MEMORY_PARSE = _env_bool("SHOPWISE_LOW_MEMORY_PARSE", True)
+
+#########################
+# Proxy d'images et cache de miniatures (voir image_proxy.py)
+#########################
+IMAGE_PROXY_ENABLED = _env_bool("SHOPWISE_IMAGE_PROXY_ENABLED", True)
+# URL publique du proxy (ex. https://cdn.example.com/img) ; par défaut, URL absolue de l'endpoint /img.
+IMAGE_PROXY_BASE_URL = os.environ.get("SHOPWISE_IMAGE_PROXY_BASE_URL", "")
+IMAGE_CACHE_DIR = os.environ.get("SHOPWISE_IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_BYTES = _env_int("SHOPWISE_IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+IMAGE_PROXY_MAX_SOURCE_BYTES = _env_int("SHOPWISE_IMAGE_PROXY_MAX_SOURCE_BYTES", 5 * 1024 * 1024)
+IMAGE_PROXY_THUMB_WIDTH = _env_int("SHOPWISE_IMAGE_PROXY_THUMB_WIDTH", 320)
+IMAGE_PROXY_LOGO_WIDTH = _env_int("SHOPWISE_IMAGE_PROXY_LOGO_WIDTH", 96)
+IMAGE_PROXY_QUALITY = _env_int("SHOPWISE_IMAGE_PROXY_QUALITY", 80)
+IMAGE_PROXY_CACHE_SECONDS = _env_int("SHOPWISE_IMAGE_PROXY_CACHE_SECONDS", 365 * 24 * 3600)
+IMAGE_PROXY_ALLOWED_DOMAINS = tuple(
+    domain.strip() for domain in os.environ.get(
+        "SHOPWISE_IMAGE_PROXY_ALLOWED_DOMAINS",
+        "media-amazon.com,ssl-images-amazon.com,amazon.com,walmartimages.com,walmart.com,"
+        "glotelho.cm,wikimedia.org,1000logos.net"
+    ).split(",") if domain.strip()
+)
+
+#########################
+# Règles d'alerte de prix (voir alerts.py)
+#########################
+# Baisse minimale (en %) par rapport au prix de référence pour déclencher une alerte.
+ALERT_DEFAULT_MIN_DROP_PCT = _env_float("SHOPWISE_ALERT_DEFAULT_MIN_DROP_PCT", 5.0)
+# Délai minimal entre deux alertes pour un même abonnement.
+ALERT_DEFAULT_COOLDOWN_SECONDS = _env_int("SHOPWISE_ALERT_DEFAULT_COOLDOWN_SECONDS", 24 * 3600)
+
+#########################
+# File de travaux partagée entre nœuds (voir work_queue.py et worker.py)
+#########################
+# Désactivée : chaque processus web scrape lui-même. Activée : les recherches live et les vérifications
+# de prix sont confiées aux workers (python worker.py) via la file.
+WORK_QUEUE_ENABLED = _env_bool("SHOPWISE_WORK_QUEUE_ENABLED", False)
+WORK_QUEUE_DB = os.environ.get("SHOPWISE_WORK_QUEUE_DB", "work_queue.db")
+NODE_NAME = os.environ.get("SHOPWISE_NODE_NAME", socket.gethostname())
+# Durée d'un bail ; le worker le prolonge toutes les WORK_QUEUE_LEASE_SECONDS / 3 secondes.
+WORK_QUEUE_LEASE_SECONDS = _env_float("SHOPWISE_WORK_QUEUE_LEASE_SECONDS", 60.0)
+WORK_QUEUE_MAX_ATTEMPTS = _env_int("SHOPWISE_WORK_QUEUE_MAX_ATTEMPTS", 3)
+WORK_QUEUE_POLL_SECONDS = _env_float("SHOPWISE_WORK_QUEUE_POLL_SECONDS", 0.5)
+# Durée d'attente maximale d'un résultat de recherche par le nœud web.
+WORK_QUEUE_SEARCH_WAIT_SECONDS = _env_float("SHOPWISE_WORK_QUEUE_SEARCH_WAIT_SECONDS", 90.0)
+# Au-delà de ce nombre de recherches en attente dans la file (tous nœuds confondus), une nouvelle recherche
+# est rejetée (429) ; une recherche non réclamée avant WORK_QUEUE_SEARCH_WAIT_SECONDS est abandonnée.
+WORK_QUEUE_MAX_PENDING_SEARCHES = _env_int("SHOPWISE_WORK_QUEUE_MAX_PENDING_SEARCHES", 50)
+WORK_QUEUE_RETENTION_SECONDS = _env_int("SHOPWISE_WORK_QUEUE_RETENTION_SECONDS", 24 * 3600)
+WORKER_CONCURRENCY = _env_int("SHOPWISE_WORKER_CONCURRENCY", 4)
+# Nombre de produits par travail de vérification des prix.
+PRICE_CHECK_BATCH_SIZE = _env_int("SHOPWISE_PRICE_CHECK_BATCH_SIZE", 200)
+
+#########################
+# Autocomplétion des requêtes (voir suggest.py)
+#########################
+# Nombre maximal d'entrées de l'index en mémoire (requêtes et descriptions confondues).
+SUGGEST_MAX_ENTRIES = _env_int("SHOPWISE_SUGGEST_MAX_ENTRIES", 20000)
+# Part de l'index réservée aux descriptions du catalogue, moins prioritaires que les requêtes passées.
+SUGGEST_MAX_DESCRIPTIONS = _env_int("SHOPWISE_SUGGEST_MAX_DESCRIPTIONS", 5000)
+SUGGEST_DESCRIPTION_WEIGHT = _env_float("SHOPWISE_SUGGEST_DESCRIPTION_WEIGHT", 0.1)
+# Fréquence de reconstruction de l'index depuis la base partagée.
+SUGGEST_REFRESH_SECONDS = _env_int("SHOPWISE_SUGGEST_REFRESH_SECONDS", 60)
+# Décroissance : les fréquences sont multipliées par SUGGEST_DECAY_FACTOR toutes les SUGGEST_DECAY_SECONDS.
+SUGGEST_DECAY_SECONDS = _env_int("SHOPWISE_SUGGEST_DECAY_SECONDS", 24 * 3600)
+SUGGEST_DECAY_FACTOR = _env_float("SHOPWISE_SUGGEST_DECAY_FACTOR", 0.5)
+SUGGEST_MIN_HITS = _env_float("SHOPWISE_SUGGEST_MIN_HITS", 0.05)
+SUGGEST_DEFAULT_LIMIT = _env_int("SHOPWISE_SUGGEST_DEFAULT_LIMIT", 8)
+
+#########################
+# Profilage à la demande (voir profiling.py)
+#########################
+# Fraction des appels à /search et à run_price_check profilés (0 = désactivé).
+PROFILE_SAMPLE_RATE = _env_float("SHOPWISE_PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_PRICE_CHECK_SAMPLE_RATE = _env_float("SHOPWISE_PROFILE_PRICE_CHECK_SAMPLE_RATE", PROFILE_SAMPLE_RATE)
+# Jeton à fournir dans l'en-tête X-Profile pour forcer le profilage d'une requête (vide = désactivé).
+PROFILE_ADMIN_TOKEN = os.environ.get("SHOPWISE_PROFILE_ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = _env_float("SHOPWISE_PROFILE_INTERVAL_MS", 5.0)
+PROFILE_DIR = os.environ.get("SHOPWISE_PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = _env_int("SHOPWISE_PROFILE_MAX_FILES", 200)
+
+#########################
+# Requêtes couvertes (hedged requests, voir hedging.py)
+#########################
+HEDGE_ENABLED = _env_bool("SHOPWISE_HEDGE_ENABLED", True)
+# Délai avant couverture quand la latence de l'enseigne n'est pas encore connue, et bornes du délai adaptatif (s).
+HEDGE_DEFAULT_DELAY = _env_float("SHOPWISE_HEDGE_DEFAULT_DELAY", 3.0)
+HEDGE_MIN_DELAY = _env_float("SHOPWISE_HEDGE_MIN_DELAY", 0.5)
+HEDGE_MAX_DELAY = _env_float("SHOPWISE_HEDGE_MAX_DELAY", 5.0)
+# Budget : au plus 10 % de requêtes supplémentaires, avec une réserve de 10 couvertures.
+HEDGE_BUDGET_RATIO = _env_float("SHOPWISE_HEDGE_BUDGET_RATIO", 0.1)
+HEDGE_BUDGET_BURST = _env_float("SHOPWISE_HEDGE_BUDGET_BURST", 10.0)
+
+#########################
+# Contrôle d'admission et limitation de débit (voir admission.py)
+#########################
+# Threads de chaque processus web jamais occupés par un scraping ni par son attente : ils restent libres
+# pour répondre 429 et servir le catalogue (mode=index) en surcharge.
+ADMISSION_RESERVED_THREADS = _env_int("SHOPWISE_ADMISSION_RESERVED_THREADS", max(1, WEB_THREADS // 4))
+# Scrapings simultanés par processus web, et taille de la file d'attente au-delà de laquelle on rejette (429).
+# admission.py ramène leur somme à WEB_THREADS - ADMISSION_RESERVED_THREADS au plus.
+ADMISSION_MAX_CONCURRENT = _env_int("SHOPWISE_ADMISSION_MAX_CONCURRENT", max(1, WEB_THREADS // 2))
+ADMISSION_MAX_WAITING = _env_int("SHOPWISE_ADMISSION_MAX_WAITING",
+                                 max(0, WEB_THREADS - ADMISSION_RESERVED_THREADS - ADMISSION_MAX_CONCURRENT))
+ADMISSION_QUEUE_TIMEOUT = _env_float("SHOPWISE_ADMISSION_QUEUE_TIMEOUT", 30.0)
+# Seau de jetons par utilisateur (email de session, sinon IP) ; 0 désactive la limite.
+RATE_LIMIT_PER_MINUTE = _env_float("SHOPWISE_RATE_LIMIT_PER_MINUTE", 30.0)
+RATE_LIMIT_BURST = _env_float("SHOPWISE_RATE_LIMIT_BURST", 10.0)
+RATE_LIMIT_MAX_KEYS = _env_int("SHOPWISE_RATE_LIMIT_MAX_KEYS", 10000)
@@ -0,0 +1,47 @@
+"""
+Configuration gunicorn de ShopWise.
+Les valeurs proviennent de config.py et peuvent être surchargées par variables d'environnement.
+"""
+import config
+import migrate
+
+bind = "{}:{}".format(config.HOST, config.PORT)
+
+# Le scraping passe l'essentiel de son temps à attendre le réseau :
+# des workers "gthread" avec plusieurs threads chacun absorbent mieux la charge que des processus seuls.
+worker_class = "gthread"
+workers = config.WEB_WORKERS
+threads = config.WEB_THREADS
+
+# Une recherche complète peut dépasser 30 s (tentatives successives chez Amazon).
+timeout = config.WEB_TIMEOUT
+# Arrêt gracieux : sur SIGTERM, les workers cessent d'accepter des connexions
+# et disposent de ce délai pour terminer les recherches en cours.
+graceful_timeout = config.WEB_GRACEFUL_TIMEOUT
+keepalive = config.WEB_KEEPALIVE
+
+# Recyclage des workers pour borner la mémoire résidente.
+max_requests = config.WEB_MAX_REQUESTS
+max_requests_jitter = config.WEB_MAX_REQUESTS_JITTER
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """
+    Applique les migrations une seule fois, dans le processus maître, avant le lancement des workers ;
+    un échec interrompt le démarrage. Journalise ensuite la configuration effective.
+    """
+    migrate.run()
+    server.log.info("Démarrage de ShopWise : %d workers x %d threads sur %s.", workers, threads, bind)
+
+
+def worker_int(worker):
+    """Appelé sur SIGINT/SIGQUIT : arrêt immédiat du worker."""
+    worker.log.info("Worker %s interrompu.", worker.pid)
+
+
+def worker_exit(server, worker):
+    """Appelé après le drainage des requêtes en cours d'un worker."""
+    server.log.info("Worker %s arrêté après drainage des requêtes en cours.", worker.pid)
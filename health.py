@@ -0,0 +1,188 @@
+"""
+Suivi de santé des enseignes et disjoncteur (circuit breaker) par enseigne.
+Chaque worker tient ses propres statistiques en mémoire, sur une fenêtre glissante :
+taux d'erreur HTTP, latence et taux de pages vides (captcha, blocage).
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RetailerHealth:
+    """
+    Statistiques glissantes et état du disjoncteur d'une enseigne.
+      - closed    : les requêtes passent normalement,
+      - open      : l'enseigne est ignorée jusqu'à la fin du délai de refroidissement,
+      - half_open : une seule recherche sonde l'enseigne ; son premier résultat ferme ou rouvre le disjoncteur.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.responses = deque(maxlen=config.HEALTH_WINDOW)  # (succès, latence en secondes)
+        self.pages = deque(maxlen=config.HEALTH_WINDOW)      # page vide ?
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.lock = threading.Lock()
+
+    #########################
+    # Enregistrement des observations
+    #########################
+    def record_response(self, success: bool, latency: float) -> None:
+        """Enregistre le résultat d'une requête HTTP (succès = code 200)."""
+        with self.lock:
+            self.responses.append((success, latency))
+            if self.state == HALF_OPEN and not success:
+                self._open("échec de la sonde")
+            elif self.state == CLOSED:
+                self._evaluate()
+
+    def record_page(self, empty: bool) -> None:
+        """Enregistre si une page reçue contenait des résultats exploitables."""
+        with self.lock:
+            self.pages.append(empty)
+            if self.state == HALF_OPEN:
+                if empty:
+                    self._open("sonde sans résultat")
+                else:
+                    self._close()
+            elif self.state == CLOSED:
+                self._evaluate()
+
+    #########################
+    # Décisions
+    #########################
+    def allow_search(self) -> bool:
+        """
+        Indique si une recherche peut interroger l'enseigne.
+        À l'issue du refroidissement, laisse passer une unique recherche sonde.
+        """
+        with self.lock:
+            now = time.time()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < config.HEALTH_OPEN_SECONDS:
+                    return False
+                self.state = HALF_OPEN
+                self.probe_started_at = now
+                logging.info("Disjoncteur %s semi-ouvert : envoi d'une sonde.", self.name)
+                return True
+            # Semi-ouvert : une sonde est déjà en cours, sauf si elle n'a jamais abouti.
+            if now - self.probe_started_at >= config.HEALTH_OPEN_SECONDS:
+                self.probe_started_at = now
+                return True
+            return False
+
+    def latency_percentile(self, pct: float) -> float:
+        """Retourne un percentile de latence (en secondes), ou None faute d'observations suffisantes."""
+        with self.lock:
+            if len(self.responses) < config.HEALTH_MIN_SAMPLES:
+                return None
+            return self._latency_percentile(pct)
+
+    def is_open(self) -> bool:
+        """Indique si le disjoncteur est ouvert (utilisé pour interrompre les tentatives en cours)."""
+        return self.state == OPEN
+
+    def snapshot(self) -> dict:
+        """Retourne l'état et les statistiques courantes de l'enseigne."""
+        with self.lock:
+            return {
+                "source": self.name,
+                "state": self.state,
+                "error_rate": self._error_rate(),
+                "empty_rate": self._empty_rate(),
+                "latency_p50_ms": self._latency_percentile(50) * 1000,
+                "latency_p90_ms": self._latency_percentile(90) * 1000,
+                "samples": len(self.responses),
+            }
+
+    #########################
+    # Fonctions internes (appelées sous verrou)
+    #########################
+    def _error_rate(self) -> float:
+        if not self.responses:
+            return 0.0
+        return sum(1 for success, _ in self.responses if not success) / len(self.responses)
+
+    def _empty_rate(self) -> float:
+        if not self.pages:
+            return 0.0
+        return sum(1 for empty in self.pages if empty) / len(self.pages)
+
+    def _latency_percentile(self, pct: float) -> float:
+        latencies = sorted(latency for _, latency in self.responses)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, int(pct / 100.0 * len(latencies)))
+        return latencies[index]
+
+    def _evaluate(self) -> None:
+        if len(self.responses) >= config.HEALTH_MIN_SAMPLES and self._error_rate() >= config.HEALTH_MAX_ERROR_RATE:
+            self._open("taux d'erreur {:.0%}".format(self._error_rate()))
+        elif len(self.pages) >= config.HEALTH_MIN_SAMPLES and self._empty_rate() >= config.HEALTH_MAX_EMPTY_RATE:
+            self._open("taux de pages vides {:.0%}".format(self._empty_rate()))
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = time.time()
+        logging.warning("Disjoncteur %s ouvert (%s) pour %d s.", self.name, reason, config.HEALTH_OPEN_SECONDS)
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self.responses.clear()
+        self.pages.clear()
+        logging.info("Disjoncteur %s refermé : l'enseigne répond à nouveau.", self.name)
+
+
+#########################
+# Registre des enseignes
+#########################
+_trackers = {}
+_trackers_lock = threading.Lock()
+# Enseignes ignorées par les workers de la file de travaux -> date du dernier signalement.
+_reported = {}
+
+
+def get_tracker(name: str) -> RetailerHealth:
+    """Retourne le suivi de santé d'une enseigne, en le créant au besoin."""
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = _trackers[name] = RetailerHealth(name)
+        return tracker
+
+
+def report_degraded(sources: list) -> None:
+    """Enregistre les enseignes ignorées par une recherche exécutée dans un autre processus (worker)."""
+    now = time.time()
+    with _trackers_lock:
+        for name in sources:
+            _reported[name] = now
+
+
+def degraded_sources() -> list:
+    """
+    Liste les enseignes dont le disjoncteur local n'est pas fermé, ainsi que celles signalées
+    par les workers depuis moins de HEALTH_OPEN_SECONDS.
+    """
+    since = time.time() - config.HEALTH_OPEN_SECONDS
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+        reported = {name for name, reported_at in _reported.items() if reported_at >= since}
+    return sorted(reported | {tracker.name for tracker in trackers if tracker.state != CLOSED})
+
+
+def snapshot() -> list:
+    """Retourne l'état de toutes les enseignes suivies."""
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+    return [tracker.snapshot() for tracker in trackers]
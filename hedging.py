@@ -0,0 +1,196 @@
+"""
+Requêtes HTTP couvertes (hedged requests) pour réduire la latence de queue des pages scrapées.
+Si une page n'a pas répondu après un délai adaptatif (p90 des requêtes principales de l'enseigne), une requête
+dupliquée est envoyée et la première réponse est retenue ; l'autre est abandonnée.
+Un budget global borne le trafic supplémentaire à une fraction des requêtes principales.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import config
+import profiling
+
+
+class HedgeBudget:
+    """Seau de jetons : chaque requête principale crédite HEDGE_BUDGET_RATIO jeton, chaque couverture en consomme un."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = config.HEDGE_BUDGET_BURST
+
+    def credit(self) -> None:
+        with self.lock:
+            self.tokens = min(config.HEDGE_BUDGET_BURST, self.tokens + config.HEDGE_BUDGET_RATIO)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class HedgeStats:
+    """Compteurs par enseigne : requêtes, couvertures envoyées, couvertures gagnantes, budget épuisé."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def incr(self, retailer: str, counter: str) -> None:
+        with self.lock:
+            counters = self.counters.setdefault(retailer, {"requests": 0, "hedges": 0, "wins": 0, "budget_exhausted": 0})
+            counters[counter] += 1
+
+    def snapshot(self) -> list:
+        with self.lock:
+            result = []
+            for retailer, counters in sorted(self.counters.items()):
+                entry = dict(counters, source=retailer)
+                entry["hedge_rate"] = counters["hedges"] / counters["requests"] if counters["requests"] else 0.0
+                entry["win_rate"] = counters["wins"] / counters["hedges"] if counters["hedges"] else 0.0
+                result.append(entry)
+            return result
+
+
+class PrimaryLatencies:
+    """
+    Fenêtre glissante, par enseigne, des latences des requêtes principales (jusqu'aux en-têtes de réponse).
+    Chaque requête principale est mesurée même quand sa couverture l'emporte : la latence retenue par
+    health.py est celle de la réponse gagnante, qui sous-estimerait la queue de distribution.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def record(self, retailer: str, latency: float) -> None:
+        with self.lock:
+            self.windows.setdefault(retailer, deque(maxlen=config.HEALTH_WINDOW)).append(latency)
+
+    def percentile(self, retailer: str, pct: float) -> float:
+        """Retourne un percentile de latence (en secondes), ou None faute d'observations suffisantes."""
+        with self.lock:
+            latencies = sorted(self.windows.get(retailer, ()))
+        if len(latencies) < config.HEALTH_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(pct / 100.0 * len(latencies)))]
+
+
+_budget = HedgeBudget()
+_stats = HedgeStats()
+_primary_latencies = PrimaryLatencies()
+
+
+def hedge_delay(retailer: str) -> float:
+    """Délai avant couverture : p90 de latence des requêtes principales de l'enseigne, borné par la configuration."""
+    p90 = _primary_latencies.percentile(retailer, 90)
+    if p90 is None:
+        return config.HEDGE_DEFAULT_DELAY
+    return min(max(p90, config.HEDGE_MIN_DELAY), config.HEDGE_MAX_DELAY)
+
+
+def _close_quietly(response) -> None:
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+def hedged_get(session, url: str, retailer: str, **kwargs):
+    """
+    Équivalent de session.get(url, **kwargs) avec couverture.
+    Les tentatives sont émises en mode stream : la première réponse reçue est retenue et son corps
+    téléchargé, la perdante est fermée sans que son corps soit lu (connexion libérée).
+    Si une tentative échoue, attend l'autre.
+    Lève l'exception de la dernière tentative si toutes échouent.
+    """
+    kwargs.setdefault("timeout", config.SCRAPE_TIMEOUT)
+    if not config.HEDGE_ENABLED:
+        return session.get(url, **kwargs)
+
+    _stats.incr(retailer, "requests")
+    _budget.credit()
+    kwargs["stream"] = True
+    results = queue.Queue()
+    # Le choix du gagnant et le dépôt d'une réponse se font sous le même verrou :
+    # une réponse arrivée après le choix est toujours fermée par la tentative elle-même.
+    lock = threading.Lock()
+    winner_chosen = threading.Event()
+
+    def attempt(is_hedge: bool) -> None:
+        started = time.monotonic()
+        try:
+            response = session.get(url, **kwargs)
+        except Exception as e:
+            results.put((is_hedge, None, e))
+            return
+        if not is_hedge:
+            _primary_latencies.record(retailer, time.monotonic() - started)
+        with lock:
+            if not winner_chosen.is_set():
+                results.put((is_hedge, response, None))
+                return
+        # La réponse perdante est abandonnée : on libère sa connexion sans lire le corps.
+        _close_quietly(response)
+
+    def choose_winner() -> None:
+        with lock:
+            winner_chosen.set()
+            # Une réponse arrivée entre-temps est également libérée.
+            while True:
+                try:
+                    _, other, _ = results.get_nowait()
+                except queue.Empty:
+                    break
+                if other is not None:
+                    _close_quietly(other)
+
+    threading.Thread(target=profiling.bind(attempt), args=(False,), daemon=True).start()
+    pending = 1
+    hedged = False
+    delay = hedge_delay(retailer)
+    deadline = time.monotonic() + delay + kwargs["timeout"] + 1.0
+    last_error = None
+    while pending:
+        wait = delay if not hedged else max(0.0, deadline - time.monotonic())
+        try:
+            is_hedge, response, error = results.get(timeout=wait)
+        except queue.Empty:
+            if hedged:
+                break
+            hedged = True
+            if _budget.try_spend():
+                _stats.incr(retailer, "hedges")
+                logging.info("Requête couverte après %.2f s pour %s", delay, url)
+                threading.Thread(target=profiling.bind(attempt), args=(True,), daemon=True).start()
+                pending += 1
+            else:
+                _stats.incr(retailer, "budget_exhausted")
+            continue
+        pending -= 1
+        if error is not None:
+            last_error = error
+            if not hedged:
+                break
+            continue
+        choose_winner()
+        if is_hedge:
+            _stats.incr(retailer, "wins")
+        try:
+            response.content  # Téléchargement du corps de la réponse gagnante
+        finally:
+            response.close()
+        return response
+    choose_winner()
+    if last_error is not None:
+        raise last_error
+    raise TimeoutError("Aucune réponse pour {}".format(url))
+
+
+def snapshot() -> list:
+    """Retourne les statistiques de couverture par enseigne."""
+    return _stats.snapshot()
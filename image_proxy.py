@@ -0,0 +1,329 @@
+"""
+Proxy d'images avec cache disque de miniatures.
+Chaque image distante (imageURL, sourceLogo) n'est téléchargée qu'une fois : l'image source est conservée
+dans le cache et sert à toutes ses variantes (largeur, format), stockées par empreinte de contenu.
+Le plafond du cache couvre les blobs et les fichiers de référence.
+Pillow est optionnel : sans lui, les images sont mises en cache et servies telles quelles.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+import config
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow non installé : pas de redimensionnement
+    Image = None
+
+# Largeurs autorisées, pour borner le nombre de variantes en cache.
+ALLOWED_WIDTHS = (64, 96, 160, 320, 640)
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+MAX_REDIRECTS = 3
+# Référence de l'image source téléchargée, partagée par toutes les variantes (largeur, format).
+SOURCE_VARIANT = (0, "source")
+
+
+class ImageProxyError(Exception):
+    """Erreur de récupération ou de traitement d'une image (le code HTTP à renvoyer est joint)."""
+
+    def __init__(self, message: str, status: int = 502):
+        super().__init__(message)
+        self.status = status
+
+
+#########################
+# Fonctions utilitaires
+#########################
+def is_allowed_url(url: str) -> bool:
+    """Vérifie que l'URL pointe vers un domaine d'enseigne connu (le proxy n'est pas ouvert)."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    host = parsed.hostname.lower()
+    return any(host == domain or host.endswith("." + domain) for domain in config.IMAGE_PROXY_ALLOWED_DOMAINS)
+
+
+def choose_width(width: int) -> int:
+    """Ramène une largeur demandée à la plus petite largeur autorisée qui la couvre."""
+    for allowed in ALLOWED_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return ALLOWED_WIDTHS[-1]
+
+
+def choose_format(accept_header: str) -> str:
+    """Choisit WebP si le client l'accepte, JPEG sinon."""
+    if Image is None:
+        return "orig"
+    return "webp" if "image/webp" in (accept_header or "") else "jpeg"
+
+
+def sniff_mime_type(data: bytes) -> str:
+    """Devine le type MIME d'une image d'après ses premiers octets."""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _ref_path(url: str, width: int, fmt: str) -> str:
+    key = hashlib.sha256("{}|{}|{}".format(url, width, fmt).encode("utf-8")).hexdigest()
+    return os.path.join(config.IMAGE_CACHE_DIR, "refs", key[:2], key)
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(config.IMAGE_CACHE_DIR, "blobs", digest[:2], digest)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _disk_usage(stat) -> int:
+    """Place occupée sur disque (au moins un bloc, même pour un petit fichier de référence)."""
+    return max(stat.st_size, getattr(stat, "st_blocks", 0) * 512)
+
+
+#########################
+# Cache disque borné (éviction des fichiers les moins récemment utilisés)
+#########################
+class ImageCache:
+    """
+    Comptabilise la taille du cache (blobs et références) et évince les fichiers les plus anciens
+    au-delà du plafond. Une référence dont le blob a été évincé est simplement régénérée à la lecture suivante.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    def _scan(self) -> list:
+        entries = []
+        for subdir in ("blobs", "refs"):
+            for dirpath, _, filenames in os.walk(os.path.join(config.IMAGE_CACHE_DIR, subdir)):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, _disk_usage(stat), path))
+        return entries
+
+    def added(self, size: int) -> None:
+        """Signale l'ajout de `size` octets (blob et/ou référence) et évince si le plafond est dépassé."""
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self.total_bytes += size
+            if self.total_bytes <= config.IMAGE_CACHE_MAX_BYTES:
+                return
+            # Rescan complet : d'autres workers écrivent dans le même répertoire.
+            entries = sorted(self._scan())
+            self.total_bytes = sum(size for _, size, _ in entries)
+            target = config.IMAGE_CACHE_MAX_BYTES * 0.9
+            for _, size, path in entries:
+                if self.total_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self.total_bytes -= size
+                except OSError:
+                    pass
+            logging.info("Cache d'images réduit à %d octets.", self.total_bytes)
+
+
+_cache = ImageCache()
+# Images en cours de téléchargement : URL -> [verrou, nombre de requêtes en attente].
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+#########################
+# Récupération et redimensionnement
+#########################
+def _get_following_allowed_redirects(url: str):
+    """
+    Effectue la requête en suivant les redirections une à une : chaque cible doit rester
+    dans les domaines autorisés (sinon une redirection ferait du proxy un relais vers des URL internes).
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        response = requests.get(url, timeout=config.SCRAPE_TIMEOUT, stream=True, allow_redirects=False,
+                                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"})
+        if not response.is_redirect:
+            return response
+        response.close()
+        url = urljoin(url, response.headers["Location"])
+        if not is_allowed_url(url):
+            raise ImageProxyError("Redirection vers un domaine non autorisé", status=403)
+    raise ImageProxyError("Trop de redirections pour l'image")
+
+
+def fetch_original(url: str) -> bytes:
+    """Télécharge l'image distante en limitant sa taille."""
+    try:
+        response = _get_following_allowed_redirects(url)
+    except requests.RequestException as e:
+        raise ImageProxyError("Image injoignable : {}".format(e))
+    with response:
+        if response.status_code != 200:
+            raise ImageProxyError("Erreur HTTP {} pour l'image".format(response.status_code))
+        data = io.BytesIO()
+        for chunk in response.iter_content(64 * 1024):
+            data.write(chunk)
+            if data.tell() > config.IMAGE_PROXY_MAX_SOURCE_BYTES:
+                raise ImageProxyError("Image source trop volumineuse", status=413)
+    return data.getvalue()
+
+
+def make_thumbnail(original: bytes, width: int, fmt: str) -> bytes:
+    """Redimensionne l'image (sans l'agrandir) et l'encode en WebP ou JPEG."""
+    if fmt == "orig":
+        return original
+    try:
+        with Image.open(io.BytesIO(original)) as image:
+            image.thumbnail((width, width * 4))
+            if fmt == "jpeg":
+                if image.mode in ("RGBA", "LA", "P"):
+                    image = image.convert("RGBA")
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.split()[-1])
+                    image = background
+                elif image.mode != "RGB":
+                    image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            output = io.BytesIO()
+            image.save(output, format=fmt.upper(), quality=config.IMAGE_PROXY_QUALITY)
+            return output.getvalue()
+    except Exception as e:
+        raise ImageProxyError("Image illisible : {}".format(e))
+
+
+def get_thumbnail(url: str, width: int, fmt: str) -> tuple:
+    """
+    Retourne (contenu, type MIME, empreinte) de la miniature demandée.
+    La référence (url, largeur, format) pointe vers un blob nommé par l'empreinte de son contenu :
+    une même image servie par plusieurs URL n'est stockée qu'une fois.
+    """
+    if not is_allowed_url(url):
+        raise ImageProxyError("Domaine d'image non autorisé", status=403)
+    width = choose_width(width)
+    ref_path = _ref_path(url, width, fmt)
+    cached = _read_cached(ref_path, fmt)
+    if cached is not None:
+        return cached
+    # Des requêtes simultanées pour la même image attendent la première au lieu de télécharger à leur tour.
+    with _generation_lock(url):
+        cached = _read_cached(ref_path, fmt)
+        if cached is not None:
+            return cached
+        return _generate(url, width, fmt, ref_path)
+
+
+def _read_cached(ref_path: str, fmt: str) -> tuple:
+    """Retourne la miniature en cache (contenu, type MIME, empreinte), ou None."""
+    cached = _read_blob(ref_path)
+    if cached is None:
+        return None
+    data, digest = cached
+    return data, MIME_TYPES.get(fmt) or sniff_mime_type(data), digest
+
+
+def _read_blob(ref_path: str) -> tuple:
+    """Retourne (contenu, empreinte) du blob désigné par une référence, ou None (absente ou évincée)."""
+    try:
+        with open(ref_path, "r") as f:
+            digest = f.read().strip()
+        blob_path = _blob_path(digest)
+        with open(blob_path, "rb") as f:
+            data = f.read()
+        # Marque la référence et le blob comme récemment utilisés.
+        os.utime(ref_path)
+        os.utime(blob_path)
+        return data, digest
+    except OSError:
+        return None
+
+
+def _store(ref_path: str, data: bytes) -> str:
+    """Enregistre un blob (s'il est nouveau) et sa référence ; retourne l'empreinte du contenu."""
+    digest = hashlib.sha256(data).hexdigest()
+    blob_path = _blob_path(digest)
+    added = 0
+    if not os.path.exists(blob_path):
+        _atomic_write(blob_path, data)
+        added += _disk_usage(os.stat(blob_path))
+    _atomic_write(ref_path, digest.encode("ascii"))
+    _cache.added(added + _disk_usage(os.stat(ref_path)))
+    return digest
+
+
+def _load_original(url: str) -> bytes:
+    """Retourne l'image source depuis le cache, ou la télécharge une fois pour toutes ses variantes."""
+    ref_path = _ref_path(url, *SOURCE_VARIANT)
+    cached = _read_blob(ref_path)
+    if cached is not None:
+        return cached[0]
+    original = fetch_original(url)
+    _store(ref_path, original)
+    return original
+
+
+@contextmanager
+def _generation_lock(key: str):
+    """Verrou par image source, partagé par les threads du processus et libéré par le dernier utilisateur."""
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
+
+
+def _generate(url: str, width: int, fmt: str, ref_path: str) -> tuple:
+    """Génère la miniature depuis l'image source (en cache ou téléchargée) et l'enregistre dans le cache."""
+    start = time.monotonic()
+    data = make_thumbnail(_load_original(url), width, fmt)
+    digest = _store(ref_path, data)
+    logging.info("Miniature %dpx (%s) générée pour %s en %.0f ms.", width, fmt, url, (time.monotonic() - start) * 1000)
+    return data, MIME_TYPES.get(fmt) or sniff_mime_type(data), digest
+
+
+#########################
+# Réécriture des résultats de recherche
+#########################
+def rewrite_record(record: dict, proxy_url) -> dict:
+    """
+    Retourne une copie du résultat dont imageURL et sourceLogo pointent vers le proxy.
+    `proxy_url(url, width)` construit l'URL du proxy.
+    """
+    record = dict(record)
+    for field, width in (("imageURL", config.IMAGE_PROXY_THUMB_WIDTH), ("sourceLogo", config.IMAGE_PROXY_LOGO_WIDTH)):
+        url = record.get(field)
+        if url and url != "N/A" and is_allowed_url(url):
+            record[field] = proxy_url(url, width)
+    return record
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test de charge local de l'endpoint /search.
+Rapporte le débit (requêtes/s) et les latences p50/p99.
+Exemple :
+    python loadtest.py --url http://localhost:5000 --query macbook --query iphone --concurrency 8 --requests 200
+"""
+import argparse
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values: list, pct: float) -> float:
+    """Retourne le percentile demandé (méthode du rang le plus proche)."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run(url: str, queries: list, concurrency: int, total: int, mode: str, timeout: float) -> dict:
+    """Envoie `total` requêtes /search avec `concurrency` clients simultanés."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    query_cycle = itertools.cycle(queries)
+    local = threading.local()
+
+    def one_request(query):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        params = {"query": query}
+        if mode:
+            params["mode"] = mode
+        start = time.perf_counter()
+        try:
+            response = local.session.get(url.rstrip("/") + "/search", params=params, timeout=timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(total):
+            executor.submit(one_request, next(query_cycle))
+    duration = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "duration_s": duration,
+        "rps": total / duration if duration else float('nan'),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge de /search")
+    parser.add_argument("--url", default="http://localhost:5000", help="URL de base du serveur")
+    parser.add_argument("--query", action="append", help="Mot-clé à rechercher (répétable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Nombre de clients simultanés")
+    parser.add_argument("--requests", type=int, default=100, help="Nombre total de requêtes")
+    parser.add_argument("--mode", default=None, help="Mode de recherche (live ou index)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout par requête (s)")
+    args = parser.parse_args()
+
+    stats = run(args.url, args.query or ["macbook"], args.concurrency, args.requests, args.mode, args.timeout)
+    print("Requêtes   : {requests} ({errors} erreurs) en {duration_s:.1f} s".format(**stats))
+    print("Débit      : {rps:.2f} req/s".format(**stats))
+    print("Latence    : p50 = {p50_ms:.0f} ms, p99 = {p99_ms:.0f} ms".format(**stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Mesure du pic de mémoire résidente (RSS) par recherche concurrente.
+Chaque mode d'analyse est mesuré dans un sous-processus neuf, pour que le pic ne soit pas faussé par le précédent.
+Exemples :
+    python memprofile.py --query macbook --concurrency 4
+    python memprofile.py --html page_amazon.html --retailer amazon --concurrency 20
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {"low": "1", "full": "0"}
+
+
+def current_peak_rss_mb() -> float:
+    """Retourne le pic de RSS du processus courant, en Mo (ru_maxrss est en Ko sous Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_searches(query: str, concurrency: int) -> int:
+    """Lance `concurrency` recherches complètes (3 enseignes) en parallèle ; retourne le nombre de produits."""
+    from scrapers.amazon_scraper import scrape_amazon
+    from scrapers.glotehlo_scraper import scrape_glotelho
+    from scrapers.walmart_scraper import scrape_walmart
+
+    def one_search(_):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            amazon = executor.submit(scrape_amazon, query)
+            glotelho = executor.submit(scrape_glotelho, query)
+            walmart = executor.submit(scrape_walmart, query)
+            return len(amazon.result()) + len(glotelho.result()) + len(walmart.result())
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return sum(executor.map(one_search, range(concurrency)))
+
+
+def run_parses(html_path: str, retailer: str, concurrency: int) -> int:
+    """Analyse une page HTML enregistrée `concurrency` fois en parallèle ; retourne le nombre de produits."""
+    import importlib
+    module_name = {"amazon": "amazon_scraper", "walmart": "walmart_scraper", "glotelho": "glotehlo_scraper"}[retailer]
+    module = importlib.import_module("scrapers." + module_name)
+    with open(html_path, "rb") as f:
+        content = f.read()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return sum(len(records) for records in executor.map(lambda _: module.parse_page(content, 2), range(concurrency)))
+
+
+def worker(args) -> None:
+    """Exécuté dans le sous-processus : mesure un mode et imprime le résultat en JSON."""
+    # Les imports lourds (bs4, pandas, requests) font partie de la base, pas de la recherche.
+    import scrapers.amazon_scraper, scrapers.glotehlo_scraper, scrapers.walmart_scraper  # noqa: F401
+    baseline = current_peak_rss_mb()
+    if args.html:
+        products = run_parses(args.html, args.retailer, args.concurrency)
+    else:
+        products = run_searches(args.query, args.concurrency)
+    peak = current_peak_rss_mb()
+    print(json.dumps({
+        "baseline_mb": baseline,
+        "peak_mb": peak,
+        "per_search_mb": (peak - baseline) / args.concurrency,
+        "products": products,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pic de RSS par recherche concurrente")
+    parser.add_argument("--query", default="macbook", help="Mot-clé à rechercher")
+    parser.add_argument("--concurrency", type=int, default=4, help="Nombre de recherches simultanées")
+    parser.add_argument("--mode", choices=sorted(MODES), action="append", help="Mode(s) d'analyse à mesurer")
+    parser.add_argument("--html", help="Page HTML enregistrée à analyser (mesure hors ligne)")
+    parser.add_argument("--retailer", default="amazon", choices=["amazon", "walmart", "glotelho"])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    for mode in args.mode or ["low", "full"]:
+        env = dict(os.environ, SHOPWISE_LOW_MEMORY_PARSE=MODES[mode])
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--query", args.query,
+                   "--concurrency", str(args.concurrency), "--retailer", args.retailer]
+        if args.html:
+            command += ["--html", os.path.abspath(args.html)]
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print("Mode {:<4} : base {baseline_mb:.0f} Mo, pic {peak_mb:.0f} Mo, "
+              "{per_search_mb:.1f} Mo par recherche concurrente ({products} produits)".format(mode, **stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Création et migration des schémas SQLite (abonnements, règles d'alerte, catalogue local).
+Étape unique par déploiement, exécutée avant le démarrage des workers : par le processus maître
+gunicorn (hook on_starting), par le planificateur ou manuellement :
+    python migrate.py
+Les workers web et de scraping n'exécutent aucune instruction DDL.
+"""
+import logging
+import sqlite3
+
+import alerts
+import catalog
+import config
+import subscriptions
+
+
+def init_db() -> None:
+    """Initialise la base de données SQLite pour les abonnements et applique ses migrations."""
+    with sqlite3.connect(config.SUBSCRIPTIONS_DB, timeout=30) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_url TEXT,
+                initial_price REAL,
+                email TEXT
+            )
+        """)
+        alerts.migrate(conn)
+        subscriptions.migrate(conn)
+        conn.commit()
+    logging.info("Base de données initialisée avec succès.")
+
+
+def run() -> None:
+    """Crée ou met à jour tous les schémas ; lève une exception si la base des abonnements ne peut être migrée."""
+    init_db()
+    catalog.init_catalog()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run()
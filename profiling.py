@@ -0,0 +1,184 @@
+"""
+Profilage à la demande par échantillonnage de piles.
+Activé pour une fraction des appels (SHOPWISE_PROFILE_SAMPLE_RATE) ou par un administrateur
+via l'en-tête X-Profile (jeton SHOPWISE_PROFILE_ADMIN_TOKEN). Sans profilage, le coût se limite
+à un tirage aléatoire : aucun thread n'est démarré.
+Un profil ne contient que les piles du thread qui l'a démarré et des threads de pool travaillant
+pour lui (fonctions enveloppées par bind) : les requêtes concurrentes n'y apparaissent pas.
+Un unique thread d'échantillonnage sert tous les profils en cours.
+Les profils sont écrits au format « folded » (flamegraph.pl, speedscope), avec un nombre de fichiers borné.
+"""
+import contextvars
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+# Profil en cours dans le contexte d'exécution courant (thread de requête ou tâche de pool enveloppée).
+_current = contextvars.ContextVar("shopwise_profiler", default=None)
+
+
+def should_profile(admin_token: str = None, sample_rate: float = None) -> bool:
+    """Décide si l'appel courant doit être profilé."""
+    if admin_token and config.PROFILE_ADMIN_TOKEN and hmac.compare_digest(admin_token, config.PROFILE_ADMIN_TOKEN):
+        return True
+    sample_rate = config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return "{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class SamplingProfiler:
+    """Accumule les piles des threads rattachés au profil (thread appelant et tâches de pool enveloppées)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = Counter()
+        self.thread_ids = Counter()  # identifiant de thread -> nombre de tâches en cours pour ce profil
+        self.lock = threading.Lock()
+        self.started_at = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.time()
+        self.attach(threading.get_ident())
+        _current.set(self)
+        _sampler.add(self)
+        return self
+
+    def attach(self, thread_id: int) -> None:
+        with self.lock:
+            self.thread_ids[thread_id] += 1
+
+    def detach(self, thread_id: int) -> None:
+        with self.lock:
+            self.thread_ids[thread_id] -= 1
+            if self.thread_ids[thread_id] <= 0:
+                del self.thread_ids[thread_id]
+
+    def sample(self, frames: dict) -> None:
+        """Enregistre la pile courante de chaque thread rattaché au profil."""
+        with self.lock:
+            thread_ids = list(self.thread_ids)
+        stacks = []
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                stacks.append(";".join(reversed(stack)))
+        with self.lock:
+            self.samples.update(stacks)
+
+    def stop(self) -> str:
+        """Arrête l'échantillonnage, écrit le profil et retourne son identifiant (nom de fichier)."""
+        _sampler.remove(self)
+        if _current.get() is self:
+            _current.set(None)
+        duration_ms = (time.time() - self.started_at) * 1000
+        with self.lock:
+            samples = Counter(self.samples)
+        try:
+            return write_profile(self.name, samples, duration_ms)
+        except Exception as e:
+            logging.error("Erreur lors de l'écriture du profil '%s': %s", self.name, e)
+            return None
+
+
+class _Sampler:
+    """Thread d'échantillonnage partagé, démarré au premier profil actif et arrêté après le dernier."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profilers = set()
+        self.thread = None
+
+    def add(self, profiler: SamplingProfiler) -> None:
+        with self.lock:
+            self.profilers.add(profiler)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self.thread.start()
+
+    def remove(self, profiler: SamplingProfiler) -> None:
+        with self.lock:
+            self.profilers.discard(profiler)
+
+    def _run(self) -> None:
+        interval = config.PROFILE_INTERVAL_MS / 1000.0
+        while True:
+            time.sleep(interval)
+            with self.lock:
+                if not self.profilers:
+                    self.thread = None
+                    return
+                profilers = list(self.profilers)
+            frames = sys._current_frames()
+            for profiler in profilers:
+                profiler.sample(frames)
+
+
+_sampler = _Sampler()
+
+
+def bind(func):
+    """
+    Rattache `func` au profil en cours, pour une exécution dans un autre thread (pool, thread dédié) :
+    le thread qui l'exécute est échantillonné pour ce profil pendant l'appel. Sans profil, retourne `func`.
+    """
+    profiler = _current.get()
+    if profiler is None:
+        return func
+
+    def profiled(*args, **kwargs):
+        thread_id = threading.get_ident()
+        profiler.attach(thread_id)
+        token = _current.set(profiler)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            profiler.detach(thread_id)
+    return profiled
+
+
+def write_profile(name: str, samples: Counter, duration_ms: float) -> str:
+    """Écrit un profil au format folded et applique la limite de rétention."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    profile_id = "{}-{}-{}.folded".format(time.strftime("%Y%m%d-%H%M%S"), name, os.urandom(3).hex())
+    with open(os.path.join(config.PROFILE_DIR, profile_id), "w") as f:
+        for stack, count in samples.most_common():
+            f.write("{} {}\n".format(stack, count))
+    logging.info("Profil %s écrit (%d échantillons, %.0f ms).", profile_id, sum(samples.values()), duration_ms)
+    enforce_retention()
+    return profile_id
+
+
+def enforce_retention() -> None:
+    """Supprime les profils les plus anciens au-delà de PROFILE_MAX_FILES."""
+    try:
+        profiles = sorted(
+            (entry for entry in os.scandir(config.PROFILE_DIR) if entry.name.endswith(".folded")),
+            key=lambda entry: entry.stat().st_mtime)
+    except OSError:
+        return
+    for entry in profiles[:max(0, len(profiles) - config.PROFILE_MAX_FILES)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def start(name: str) -> SamplingProfiler:
+    """Démarre un profilage nommé."""
+    return SamplingProfiler(name).start()
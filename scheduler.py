@@ -0,0 +1,39 @@
+"""
+Processus dédié au job planifié de vérification des prix.
+À lancer une seule fois par déploiement, séparément des workers web :
+    python scheduler.py
+"""
+import logging
+import signal
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+import config
+import migrate
+from app import enqueue_price_checks, run_price_check
+
+
+def main() -> None:
+    """
+    Démarre le planificateur et l'arrête proprement sur SIGTERM/SIGINT.
+    Avec la file de travaux activée, la vérification est découpée en lots exécutés par les workers.
+    """
+    migrate.run()
+    scheduler = BlockingScheduler()
+    job_func = enqueue_price_checks if config.WORK_QUEUE_ENABLED else run_price_check
+    scheduler.add_job(func=job_func, trigger="interval", hours=config.PRICE_CHECK_INTERVAL_HOURS,
+                      id="run_price_check", max_instances=1, coalesce=True)
+
+    def shutdown(signum, frame):
+        logging.info("Signal %s reçu, arrêt du planificateur après le job en cours.", signum)
+        scheduler.shutdown(wait=True)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    logging.info("Planificateur démarré (vérification des prix toutes les %s heures).",
+                 config.PRICE_CHECK_INTERVAL_HOURS)
+    scheduler.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,18 @@ import re
 import time
 import random
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
 from fake_useragent import UserAgent
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+import config
+import health
+import hedging
+import profiling
+
 # -----------------------------------------------------------------------------
 # Configuration du Logging
 # -----------------------------------------------------------------------------
@@ -159,23 +164,61 @@ def scrape_records(item):
         logging.error(f"❌ Erreur lors de l'extraction d'un produit : {e}")
         return None
 
+# Seuls les conteneurs de résultats sont construits en mémoire (mode basse mémoire).
+RESULT_STRAINER = SoupStrainer("div", attrs={"data-component-type": "s-search-result"})
+
+def parse_page(content, page):
+    """
+    Parse une page de résultats et la convertit en enregistrements compacts.
+    L'arbre BeautifulSoup est détruit avant de retourner les enregistrements.
+    """
+    parse_only = RESULT_STRAINER if config.LOW_MEMORY_PARSE else None
+    soup = BeautifulSoup(content, "html.parser", parse_only=parse_only)
+    try:
+        results = soup.find_all("div", {"data-component-type": "s-search-result"})
+        # Seule la première page sert d'indicateur : les suivantes peuvent être légitimement vides.
+        if page == 1:
+            health.get_tracker("Amazon").record_page(empty=not results)
+        records = []
+        for item in results:
+            record = scrape_records(item)
+            if record:
+                records.append(record)
+        return records
+    finally:
+        soup.decompose()
+
 def fetch_page(session, search_term, page, headers):
     """
-    Récupère et parse une page donnée pour un terme de recherche.
+    Récupère une page donnée pour un terme de recherche et l'extrait dans le thread courant.
     Implémente une stratégie de retry en cas d'échec.
+    Retourne un tuple (page, enregistrements), avec None si la page n'a pas pu être récupérée.
     """
     url = get_url(search_term, page)
+    tracker = health.get_tracker("Amazon")
     logging.info(f"🌐 Récupération de la page {page} : {url}")
     for attempt in range(3):  # 3 tentatives maximum
+        if tracker.is_open():
+            logging.warning(f"⛔ Disjoncteur Amazon ouvert, abandon de la page {page}")
+            break
         logging.info(f"🔄 Tentative {attempt+1} pour la page {page}")
+        start = time.monotonic()
         try:
-            response = session.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                return page, BeautifulSoup(response.content, "html.parser")
-            else:
-                logging.error(f"❌ Erreur HTTP {response.status_code} pour la page {page}")
+            response = hedging.hedged_get(session, url, "Amazon", headers=headers, timeout=config.SCRAPE_TIMEOUT)
         except Exception as e:
+            tracker.record_response(False, time.monotonic() - start)
             logging.error(f"❌ Exception lors de la récupération de la page {page} : {e}")
+            time.sleep(1)  # Pause avant de réessayer
+            continue
+        tracker.record_response(response.status_code == 200, time.monotonic() - start)
+        if response.status_code == 200:
+            # Une erreur d'analyse n'est pas une erreur de l'enseigne : pas de nouvelle tentative.
+            try:
+                return page, parse_page(response.content, page)
+            except Exception as e:
+                logging.error(f"❌ Exception lors de l'analyse de la page {page} : {e}")
+                return page, None
+        logging.error(f"❌ Erreur HTTP {response.status_code} pour la page {page}")
         time.sleep(1)  # Pause avant de réessayer
     return page, None
 
@@ -201,23 +244,19 @@ def scrape_amazon(search_term):
 
     with ThreadPoolExecutor(max_workers=5) as executor:
         future_to_page = {
-            executor.submit(fetch_page, session, search_term, page, headers): page
+            executor.submit(profiling.bind(fetch_page), session, search_term, page, headers): page
             for page in pages_to_fetch
         }
         for future in as_completed(future_to_page):
-            page, soup = future.result()
-            if not soup:
+            page, page_records = future.result()
+            if page_records is None:
                 logging.warning(f"⚠ Aucune donnée récupérée pour la page {page}.")
                 continue
-            logging.info(f"📄 Scraping de la page {page}...")
-            results = soup.find_all("div", {"data-component-type": "s-search-result"})
-            if not results:
+            if not page_records:
                 logging.warning(f"⚠ Aucune donnée trouvée sur la page {page}.")
                 continue
-            for item in results:
-                record = scrape_records(item)
-                if record:
-                    records.append(record)
+            logging.info(f"📄 Page {page} : {len(page_records)} produits extraits.")
+            records.extend(page_records)
             time.sleep(0.2)  # Pause très courte pour limiter la charge
     
     df = pd.DataFrame(records, columns=["description", "price", "rating", "productURL", "imageURL", "hiddenFees", "source", "sourceLogo"])
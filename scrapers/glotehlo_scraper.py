@@ -1,12 +1,16 @@
 import logging
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 import time
 import pandas as pd
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+import config
+import health
+import hedging
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -15,66 +19,106 @@ app = Flask(__name__)
 CORS(app)
 
 BASE_URL = "https://glotelho.cm/search?q={query}&limit=40&page={page}"
+PRODUCT_CARD_CLASS = re.compile("flex flex-col justify-between")
+# Seules les cartes produit sont construites en mémoire (mode basse mémoire).
+RESULT_STRAINER = SoupStrainer("div", class_=PRODUCT_CARD_CLASS)
+
+def scrape_glotelho_record(product):
+    """Extrait les informations d'un produit à partir d'une carte produit Glotelho."""
+    try:
+        link_tag = product.find("a", href=True)
+        title = link_tag.find("h3").text.strip() if link_tag else "N/A"
+        product_url = "https://glotelho.cm" + link_tag["href"] if link_tag else "N/A"
+
+        # Extraction correcte de l'image : on prend data-src si présent, sinon src
+        image_tag = product.find("img")
+        image_url = image_tag["data-src"] if image_tag and "data-src" in image_tag.attrs else (image_tag["src"] if image_tag else "N/A")
+
+        price_tag = product.find("span", class_=re.compile("font-bold text-gray-900"))
+        price = price_tag.text.strip().replace("\u00a0", " ") if price_tag else "N/A"
+        
+        old_price_tag = product.find("span", class_=re.compile("line-through"))
+        old_price = old_price_tag.text.strip().replace("\u00a0", " ") if old_price_tag else "N/A"
+
+        return {
+            "description": title,
+            "price": price,
+            "oldPrice": old_price,
+            "productURL": product_url,
+            "imageURL": image_url,
+            "sourceLogo": "https://glotelho.cm/images/glotelho-ecommerce.jpg",
+            "source":"Glotehlo"
+
+        }
+    except Exception as e:
+        logging.error(f"Erreur d'extraction : {e}")
+        return None
+
+def parse_page(content, page):
+    """
+    Parse une page de résultats et la convertit en enregistrements compacts.
+    L'arbre BeautifulSoup est détruit avant de retourner les enregistrements.
+    """
+    parse_only = RESULT_STRAINER if config.LOW_MEMORY_PARSE else None
+    soup = BeautifulSoup(content, "html.parser", parse_only=parse_only)
+    try:
+        product_containers = soup.find_all("div", class_=PRODUCT_CARD_CLASS)
+        # Seule la première page sert d'indicateur : les suivantes peuvent être légitimement vides.
+        if page == 1:
+            health.get_tracker("Glotehlo").record_page(empty=not product_containers)
+        records = []
+        for product in product_containers:
+            record = scrape_glotelho_record(product)
+            if record:
+                records.append(record)
+        return records
+    finally:
+        soup.decompose()
 
 def fetch_page(search_term, page):
-    """Récupère et parse une page donnée pour un terme de recherche."""
+    """
+    Récupère une page donnée pour un terme de recherche et l'extrait en enregistrements.
+    Retourne None si la page n'a pas pu être récupérée.
+    """
     url = BASE_URL.format(query=search_term, page=page)
+    tracker = health.get_tracker("Glotehlo")
+    if tracker.is_open():
+        logging.warning(f"⛔ Disjoncteur Glotehlo ouvert, abandon de la page {page}")
+        return None
     logging.info(f"🌐 Récupération de la page {page} : {url}")
+    start = time.monotonic()
     try:
         headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return BeautifulSoup(response.content, "html.parser")
-        else:
-            logging.error(f"❌ Erreur HTTP {response.status_code} pour {url}")
-            return None
+        response = hedging.hedged_get(requests, url, "Glotehlo", headers=headers, timeout=config.SCRAPE_TIMEOUT)
     except Exception as e:
+        tracker.record_response(False, time.monotonic() - start)
         logging.error(f"❌ Exception lors de la récupération de {url} : {e}")
         return None
+    tracker.record_response(response.status_code == 200, time.monotonic() - start)
+    if response.status_code != 200:
+        logging.error(f"❌ Erreur HTTP {response.status_code} pour {url}")
+        return None
+    try:
+        return parse_page(response.content, page)
+    except Exception as e:
+        logging.error(f"❌ Exception lors de l'analyse de {url} : {e}")
+        return None
 
 def scrape_glotelho(search_term, max_pages=3):
     """Scrape les produits depuis Glotelho en évitant les doublons."""
     records = []
     seen = set()  # Ensemble pour stocker les clés uniques (URL ou description)
     for page in range(1, max_pages + 1):
-        soup = fetch_page(search_term, page)
-        if not soup:
+        page_records = fetch_page(search_term, page)
+        if not page_records:
             continue
 
-        product_containers = soup.find_all("div", class_=re.compile("flex flex-col justify-between"))
-        for product in product_containers:
-            try:
-                link_tag = product.find("a", href=True)
-                title = link_tag.find("h3").text.strip() if link_tag else "N/A"
-                product_url = "https://glotelho.cm" + link_tag["href"] if link_tag else "N/A"
-
-                # Extraction correcte de l'image : on prend data-src si présent, sinon src
-                image_tag = product.find("img")
-                image_url = image_tag["data-src"] if image_tag and "data-src" in image_tag.attrs else (image_tag["src"] if image_tag else "N/A")
-
-                price_tag = product.find("span", class_=re.compile("font-bold text-gray-900"))
-                price = price_tag.text.strip().replace("\u00a0", " ") if price_tag else "N/A"
-                
-                old_price_tag = product.find("span", class_=re.compile("line-through"))
-                old_price = old_price_tag.text.strip().replace("\u00a0", " ") if old_price_tag else "N/A"
-
-                # Définir une clé unique pour éviter les doublons (URL si disponible, sinon description)
-                key = product_url if product_url != "N/A" else title
-
-                if key not in seen:
-                    seen.add(key)
-                    records.append({
-                        "description": title,
-                        "price": price,
-                        "oldPrice": old_price,
-                        "productURL": product_url,
-                        "imageURL": image_url,
-                        "sourceLogo": "https://glotelho.cm/images/glotelho-ecommerce.jpg",
-                        "source":"Glotehlo"
-
-                    })
-            except Exception as e:
-                logging.error(f"Erreur d'extraction : {e}")
+        for record in page_records:
+            # Définir une clé unique pour éviter les doublons (URL si disponible, sinon description)
+            key = record["productURL"] if record["productURL"] != "N/A" else record["description"]
+            if key not in seen:
+                seen.add(key)
+                records.append(record)
         time.sleep(1)
     
     # Trier les résultats par prix du moins cher au plus cher
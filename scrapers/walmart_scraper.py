@@ -1,6 +1,6 @@
 import logging
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
 import time
 from fake_useragent import UserAgent
@@ -9,6 +9,11 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import config
+import health
+import hedging
+import profiling
+
 # Configuration du logging
 logging.basicConfig(
     filename="walmart_scraper.log",
@@ -140,23 +145,58 @@ def scrape_walmart_record(item):
         logging.error(f"Erreur lors de l'extraction d'un produit: {e}")
         return None
 
+# Seuls les conteneurs de produits sont construits en mémoire (mode basse mémoire).
+RESULT_STRAINER = SoupStrainer("div", attrs={"data-item-id": True})
+
+def parse_page(content, page):
+    """
+    Parse une page de résultats et la convertit en enregistrements compacts.
+    L'arbre BeautifulSoup est détruit avant de retourner les enregistrements.
+    """
+    parse_only = RESULT_STRAINER if config.LOW_MEMORY_PARSE else None
+    soup = BeautifulSoup(content, "html.parser", parse_only=parse_only)
+    try:
+        # Récupération de tous les produits identifiés par data-item-id
+        product_items = soup.find_all("div", {"data-item-id": True})
+        # Seule la première page sert d'indicateur : les suivantes peuvent être légitimement vides.
+        if page == 1:
+            health.get_tracker("Walmart").record_page(empty=not product_items)
+        records = []
+        for item in product_items:
+            record = scrape_walmart_record(item)
+            if record:
+                records.append(record)
+        return records
+    finally:
+        soup.decompose()
+
 def fetch_page(session, search_term, page, headers):
     """
-    Récupère et parse une page donnée pour le terme de recherche.
-    Retourne un tuple (page, BeautifulSoup).
+    Récupère une page donnée pour le terme de recherche et l'extrait dans le thread courant.
+    Retourne un tuple (page, enregistrements), avec None si la page n'a pas pu être récupérée.
     """
     url = get_url(search_term, page)
+    tracker = health.get_tracker("Walmart")
+    if tracker.is_open():
+        logging.warning(f"⛔ Disjoncteur Walmart ouvert, abandon de la page {page}")
+        return page, None
     logging.info(f"🌐 Récupération de la page {page}: {url}")
+    start = time.monotonic()
     try:
-        response = session.get(url, headers=headers)
-        if response.status_code == 200:
-            return page, BeautifulSoup(response.content, "html.parser")
-        else:
-            logging.error(f"❌ Erreur lors de la récupération de la page {page}, code HTTP: {response.status_code}")
-            return page, None
+        response = hedging.hedged_get(session, url, "Walmart", headers=headers, timeout=config.SCRAPE_TIMEOUT)
     except Exception as e:
+        tracker.record_response(False, time.monotonic() - start)
         logging.error(f"❌ Exception lors de la récupération de la page {page}: {e}")
         return page, None
+    tracker.record_response(response.status_code == 200, time.monotonic() - start)
+    if response.status_code != 200:
+        logging.error(f"❌ Erreur lors de la récupération de la page {page}, code HTTP: {response.status_code}")
+        return page, None
+    try:
+        return page, parse_page(response.content, page)
+    except Exception as e:
+        logging.error(f"❌ Exception lors de l'analyse de la page {page}: {e}")
+        return page, None
 
 def scrape_walmart(search_term):
     """
@@ -181,21 +221,16 @@ def scrape_walmart(search_term):
     
     with ThreadPoolExecutor(max_workers=5) as executor:
         future_to_page = {
-            executor.submit(fetch_page, session, search_term, page, headers): page
+            executor.submit(profiling.bind(fetch_page), session, search_term, page, headers): page
             for page in pages_to_fetch
         }
         for future in as_completed(future_to_page):
-            page, soup = future.result()
-            if not soup:
+            page, page_records = future.result()
+            if page_records is None:
                 logging.warning(f"⚠ Aucune donnée récupérée pour la page {page}.")
                 continue
-            logging.info(f"📄 Scraping de la page {page}...")
-            # Récupération de tous les produits identifiés par data-item-id
-            product_items = soup.find_all("div", {"data-item-id": True})
-            for item in product_items:
-                record = scrape_walmart_record(item)
-                if record:
-                    records.append(record)
+            logging.info(f"📄 Page {page} : {len(page_records)} produits extraits.")
+            records.extend(page_records)
             time.sleep(0.2)
     
     df = pd.DataFrame(records, columns=["description", "price", "rating", "productURL", "imageURL", "hiddenFees", "source", "sourceLogo"])
@@ -0,0 +1,119 @@
+"""
+Consultation et suppression des abonnements d'un utilisateur.
+La pagination est par curseur (keyset) sur l'index (email, id) : le coût d'une page ne dépend
+pas de sa profondeur. Les filtres par enseigne et par baisse de prix sont appliqués en SQL.
+"""
+import sqlite3
+
+import alerts
+
+SCHEMA = """
+    CREATE INDEX IF NOT EXISTS idx_subscriptions_email_id ON subscriptions(email, id);
+    CREATE INDEX IF NOT EXISTS idx_subscriptions_email_retailer_id ON subscriptions(email, retailer, id);
+"""
+
+# Enseigne déduite de l'URL pour les abonnements antérieurs à la colonne retailer.
+BACKFILL_RETAILER_SQL = """
+    UPDATE subscriptions SET retailer = CASE
+        WHEN product_url LIKE '%amazon.%' THEN 'Amazon'
+        WHEN product_url LIKE '%walmart.%' THEN 'Walmart'
+        WHEN product_url LIKE '%glotelho.%' THEN 'Glotehlo'
+    END
+    WHERE retailer IS NULL
+"""
+
+SELECT_SQL = """
+    SELECT s.id, s.product_url, s.retailer, s.initial_price, s.target_price, s.min_drop_pct,
+           s.cooldown_seconds, s.last_alert_at, lp.price
+    FROM subscriptions s
+    LEFT JOIN latest_prices lp ON lp.product_url = s.product_url
+"""
+
+DROPPED_CONDITION = "lp.price < s.initial_price"
+NOT_DROPPED_CONDITION = "(lp.price IS NULL OR lp.price >= s.initial_price)"
+
+MAX_PAGE_SIZE = 200
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Ajoute la colonne retailer (renseignée depuis l'URL) et les index de pagination."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(subscriptions)")}
+    if "retailer" not in existing:
+        alerts.add_column(conn, "subscriptions", "retailer", "TEXT")
+        conn.execute(BACKFILL_RETAILER_SQL)
+    conn.executescript(SCHEMA)
+
+
+def _filters(email: str, retailer: str = None, status: str = None) -> tuple:
+    """Construit les conditions communes (propriétaire, enseigne, statut de baisse de prix)."""
+    conditions, params = ["s.email = ?"], [email]
+    if retailer:
+        conditions.append("s.retailer = ?")
+        params.append(retailer)
+    if status == "dropped":
+        conditions.append(DROPPED_CONDITION)
+    elif status == "not_dropped":
+        conditions.append(NOT_DROPPED_CONDITION)
+    elif status is not None:
+        raise ValueError("Statut inconnu : {} (attendu : dropped ou not_dropped)".format(status))
+    return conditions, params
+
+
+def _row_to_dict(row) -> dict:
+    sub_id, product_url, retailer, initial_price, target_price, min_drop_pct, cooldown_seconds, last_alert_at, current = row
+    return {
+        "id": sub_id,
+        "product_url": product_url,
+        "retailer": retailer,
+        "initial_price": initial_price,
+        "current_price": current,
+        "price_dropped": current is not None and current < initial_price,
+        "target_price": target_price,
+        "min_drop_pct": min_drop_pct,
+        "cooldown_hours": cooldown_seconds / 3600.0 if cooldown_seconds is not None else None,
+        "last_alert_at": last_alert_at,
+    }
+
+
+def list_page(conn: sqlite3.Connection, email: str, cursor: int = None, limit: int = 50,
+              retailer: str = None, status: str = None) -> tuple:
+    """
+    Retourne une page d'abonnements, du plus récent au plus ancien, et le curseur de la page suivante
+    (None en fin de liste). Le curseur est l'identifiant du dernier abonnement de la page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conditions, params = _filters(email, retailer, status)
+    if cursor is not None:
+        conditions.append("s.id < ?")
+        params.append(cursor)
+    sql = SELECT_SQL + " WHERE " + " AND ".join(conditions) + " ORDER BY s.id DESC LIMIT ?"
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return [_row_to_dict(row) for row in rows[:limit]], next_cursor
+
+
+def get(conn: sqlite3.Connection, email: str, sub_id: int) -> dict:
+    """Retourne un abonnement de l'utilisateur, ou None."""
+    row = conn.execute(SELECT_SQL + " WHERE s.email = ? AND s.id = ?", (email, sub_id)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def delete(conn: sqlite3.Connection, email: str, sub_ids: list) -> int:
+    """Supprime des abonnements de l'utilisateur par identifiant ; retourne le nombre supprimé."""
+    if not sub_ids:
+        return 0
+    placeholders = ",".join("?" for _ in sub_ids)
+    return conn.execute("DELETE FROM subscriptions WHERE email = ? AND id IN ({})".format(placeholders),
+                        [email] + list(sub_ids)).rowcount
+
+
+def delete_matching(conn: sqlite3.Connection, email: str, retailer: str = None, status: str = None) -> int:
+    """Supprime tous les abonnements de l'utilisateur correspondant aux filtres ; retourne le nombre supprimé."""
+    conditions, params = _filters(email, retailer, status)
+    return conn.execute("""
+        DELETE FROM subscriptions WHERE id IN (
+            SELECT s.id FROM subscriptions s
+            LEFT JOIN latest_prices lp ON lp.product_url = s.product_url
+            WHERE {}
+        )
+    """.format(" AND ".join(conditions)), params).rowcount
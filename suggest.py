@@ -0,0 +1,119 @@
+"""
+Autocomplétion des requêtes à partir d'un index de préfixes en mémoire.
+L'index est un tableau trié de clés normalisées, interrogé par recherche dichotomique ;
+il est reconstruit périodiquement en arrière-plan depuis les fréquences de recherche partagées (catalog.db)
+et les descriptions du catalogue, avec une taille bornée.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+import catalog
+import config
+
+# Les réponses aux préfixes courts (les plus coûteux à classer) sont mémorisées jusqu'à la reconstruction suivante.
+CACHED_PREFIX_LENGTH = 3
+MAX_CACHED_PREFIXES = 4096
+
+
+class PrefixIndex:
+    """Index immuable : clés triées, et pour chaque clé (forme affichée, score)."""
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+        self.keys = sorted(entries)
+        self.cache = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, prefix: str, limit: int) -> list:
+        """Retourne les `limit` formes affichées les plus fréquentes dont la clé commence par `prefix`."""
+        cacheable = len(prefix) <= CACHED_PREFIX_LENGTH
+        if cacheable:
+            cached = self.cache.get((prefix, limit))
+            if cached is not None:
+                return cached
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff")
+        best = heapq.nlargest(limit, (self.keys[i] for i in range(lo, hi)), key=lambda key: self.entries[key][1])
+        result = [self.entries[key][0] for key in best]
+        if cacheable and len(self.cache) < MAX_CACHED_PREFIXES:
+            self.cache[(prefix, limit)] = result
+        return result
+
+
+class SuggestionIndex:
+    """
+    Point d'accès de l'autocomplétion pour un processus.
+    `normalize` est la fonction de normalisation des requêtes (normalize_text de app.py).
+    """
+
+    def __init__(self, normalize):
+        self.normalize = normalize
+        self.index = PrefixIndex({})
+        self.built_at = 0.0
+        self.refresh_lock = threading.Lock()
+
+    def record_query(self, query: str) -> None:
+        """Comptabilise une requête utilisateur, sans jamais lever d'exception."""
+        key = self.normalize(query)
+        if not key:
+            return
+        try:
+            catalog.record_search(key, " ".join(query.lower().split()))
+        except Exception as e:
+            logging.error("Erreur lors de l'enregistrement de la requête '%s': %s", query, e)
+
+    def suggest(self, prefix: str, limit: int = None) -> list:
+        """Retourne les suggestions pour un préfixe saisi par l'utilisateur."""
+        limit = config.SUGGEST_DEFAULT_LIMIT if limit is None else limit
+        self.refresh_if_stale()
+        key = self.normalize(prefix)
+        if not key:
+            return []
+        # L'index est remplacé d'un bloc par la reconstruction : on lit toujours l'index courant complet.
+        return self.index.lookup(key, limit)
+
+    def refresh_if_stale(self) -> None:
+        """
+        Lance la reconstruction de l'index en arrière-plan s'il est périmé, sans jamais bloquer l'appelant :
+        un seul thread reconstruit, les requêtes lisent l'index courant jusqu'à son remplacement.
+        """
+        if time.time() - self.built_at < config.SUGGEST_REFRESH_SECONDS:
+            return
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            threading.Thread(target=self._refresh_in_background, name="suggest-refresh", daemon=True).start()
+        except Exception:
+            self.refresh_lock.release()
+            raise
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error("Erreur lors de la reconstruction de l'index d'autocomplétion: %s", e)
+        finally:
+            self.built_at = time.time()
+            self.refresh_lock.release()
+
+    def refresh(self) -> None:
+        """Applique la décroissance périodique et reconstruit l'index depuis la base."""
+        catalog.decay_searches(config.SUGGEST_DECAY_FACTOR, config.SUGGEST_MIN_HITS, config.SUGGEST_DECAY_SECONDS)
+        entries = {}
+        descriptions = catalog.recent_descriptions(min(config.SUGGEST_MAX_DESCRIPTIONS, config.SUGGEST_MAX_ENTRIES))
+        for description in descriptions:
+            key = self.normalize(description)
+            if key and key not in entries:
+                entries[key] = (description, config.SUGGEST_DESCRIPTION_WEIGHT)
+        for key, display, hits in catalog.top_searches(config.SUGGEST_MAX_ENTRIES):
+            entries[key] = (display, hits)
+        if len(entries) > config.SUGGEST_MAX_ENTRIES:
+            kept = heapq.nlargest(config.SUGGEST_MAX_ENTRIES, entries.items(), key=lambda item: item[1][1])
+            entries = dict(kept)
+        self.index = PrefixIndex(entries)
+        logging.info("Index d'autocomplétion reconstruit : %d entrées.", len(self.index))
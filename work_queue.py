@@ -0,0 +1,271 @@
+"""
+File de travaux durable partagée entre plusieurs nœuds (recherches et vérifications de prix).
+Un nœud réclame un travail pour une durée de bail (lease) qu'il prolonge par des battements de cœur ;
+un bail expiré rend le travail à nouveau réclamable (reprise après crash d'un worker).
+Les travaux identiques en cours (même clé de déduplication) ne sont exécutés qu'une fois.
+Un travail peut expirer : s'il n'a pas été réclamé à temps (plus personne n'attend son résultat), il est abandonné.
+"""
+import abc
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import config
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+class QueueFull(Exception):
+    """Trop de travaux de ce type sont déjà en attente : le nouveau travail n'a pas été ajouté."""
+
+
+Job = namedtuple("Job", "id kind payload dedup_key status attempts leased_by lease_expires result error")
+
+
+class WorkQueue(abc.ABC):
+    """
+    Interface commune des files de travaux.
+    SQLiteWorkQueue en est l'implémentation durable ; un équivalent Redis doit implémenter toutes les méthodes abstraites.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, kind: str, payload: dict, dedup_key: str = None,
+                ttl: float = None, max_pending: int = None) -> int:
+        """
+        Ajoute un travail ; si un travail de même clé est en cours, retourne son identifiant.
+        `ttl` : délai (en secondes) au-delà duquel un travail non réclamé est abandonné ; rejoindre un travail
+        en cours le prolonge. `max_pending` : lève QueueFull si autant de travaux de ce type sont déjà en attente.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def claim(self, worker_id: str, kinds: list, lease_seconds: float = None) -> Job:
+        """Réclame le plus ancien travail disponible (en attente ou au bail expiré), ou None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = None) -> bool:
+        """Prolonge le bail ; retourne False si le worker ne détient plus le travail."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, job_id: int, worker_id: str, result=None) -> bool:
+        """Marque le travail comme terminé avec son résultat."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Signale un échec : le travail est remis en attente, ou abandonné après trop de tentatives."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, job_id: int) -> Job:
+        """Retourne l'état courant d'un travail."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Supprime les travaux terminés ou abandonnés depuis plus de `older_than` secondes."""
+        raise NotImplementedError
+
+    def wait(self, job_id: int, timeout: float, poll_interval: float = 0.2) -> Job:
+        """Attend la fin d'un travail (terminé ou abandonné) ; retourne son état, même incomplet au timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.status in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+
+#########################
+# Implémentation SQLite (durable, partagée par tous les nœuds ayant accès au fichier)
+#########################
+class SQLiteWorkQueue(WorkQueue):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            dedup_key TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            leased_by TEXT,
+            lease_expires REAL,
+            result TEXT,
+            error TEXT,
+            expires_at REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        -- Un seul travail en cours par clé de déduplication.
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_inflight_dedup ON jobs(dedup_key)
+            WHERE dedup_key IS NOT NULL AND status IN ('pending', 'leased');
+        CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, kind, id);
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.WORK_QUEUE_DB
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            try:
+                conn.execute("ALTER TABLE jobs ADD COLUMN expires_at REAL")  # fichiers créés sans expiration
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    raise
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs(expires_at)
+                    WHERE expires_at IS NOT NULL AND status IN ('pending', 'leased')
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _row_to_job(self, row) -> Job:
+        if row is None:
+            return None
+        job_id, kind, payload, dedup_key, status, attempts, leased_by, lease_expires, result, error = row
+        return Job(job_id, kind, json.loads(payload), dedup_key, status, attempts, leased_by, lease_expires,
+                   json.loads(result) if result is not None else None, error)
+
+    _COLUMNS = "id, kind, payload, dedup_key, status, attempts, leased_by, lease_expires, result, error"
+
+    def enqueue(self, kind: str, payload: dict, dedup_key: str = None,
+                ttl: float = None, max_pending: int = None) -> int:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedup_key is not None:
+                row = conn.execute("SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?)",
+                                   (dedup_key, PENDING, LEASED)).fetchone()
+                if row:
+                    if expires_at is not None:
+                        conn.execute("UPDATE jobs SET expires_at = MAX(expires_at, ?) WHERE id = ?", (expires_at, row[0]))
+                    conn.execute("COMMIT")
+                    return row[0]
+            if max_pending is not None:
+                pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND kind = ?",
+                                       (PENDING, kind)).fetchone()[0]
+                if pending >= max_pending:
+                    raise QueueFull("{} travaux '{}' déjà en attente".format(pending, kind))
+            cursor = conn.execute("""
+                INSERT INTO jobs (kind, payload, dedup_key, status, expires_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (kind, json.dumps(payload), dedup_key, PENDING, expires_at, now, now))
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str, kinds: list, lease_seconds: float = None) -> Job:
+        lease_seconds = config.WORK_QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        now = time.time()
+        placeholders = ",".join("?" for _ in kinds)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Les baux expirés au-delà du nombre maximal de tentatives sont abandonnés.
+            conn.execute("""
+                UPDATE jobs SET status = ?, error = 'bail expiré', updated_at = ?
+                WHERE status = ? AND lease_expires < ? AND attempts >= ?
+            """, (FAILED, now, LEASED, now, config.WORK_QUEUE_MAX_ATTEMPTS))
+            # Les travaux expirés non réclamés (ou au bail expiré) sont abandonnés : plus personne n'attend leur résultat.
+            conn.execute("""
+                UPDATE jobs SET status = ?, error = 'expiré', leased_by = NULL, lease_expires = NULL, updated_at = ?
+                WHERE expires_at < ? AND (status = ? OR (status = ? AND lease_expires < ?))
+            """, (FAILED, now, now, PENDING, LEASED, now))
+            row = conn.execute("""
+                SELECT id FROM jobs
+                WHERE kind IN ({}) AND (status = ? OR (status = ? AND lease_expires < ?))
+                ORDER BY id LIMIT 1
+            """.format(placeholders), list(kinds) + [PENDING, LEASED, now]).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("""
+                UPDATE jobs SET status = ?, leased_by = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            """, (LEASED, worker_id, now + lease_seconds, now, row[0]))
+            job = conn.execute("SELECT {} FROM jobs WHERE id = ?".format(self._COLUMNS), (row[0],)).fetchone()
+            conn.execute("COMMIT")
+            return self._row_to_job(job)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_owned(self, sql: str, params: tuple, job_id: int, worker_id: str) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql + " WHERE id = ? AND status = ? AND leased_by = ?",
+                                  params + (job_id, LEASED, worker_id))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = None) -> bool:
+        lease_seconds = config.WORK_QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        now = time.time()
+        return self._update_owned("UPDATE jobs SET lease_expires = ?, updated_at = ?",
+                                  (now + lease_seconds, now), job_id, worker_id)
+
+    def complete(self, job_id: int, worker_id: str, result=None) -> bool:
+        return self._update_owned("UPDATE jobs SET status = ?, result = ?, lease_expires = NULL, updated_at = ?",
+                                  (DONE, json.dumps(result), time.time()), job_id, worker_id)
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        job = self.get(job_id)
+        status = FAILED if job is not None and job.attempts >= config.WORK_QUEUE_MAX_ATTEMPTS else PENDING
+        return self._update_owned("UPDATE jobs SET status = ?, error = ?, leased_by = NULL, lease_expires = NULL, updated_at = ?",
+                                  (status, error, time.time()), job_id, worker_id)
+
+    def get(self, job_id: int) -> Job:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT {} FROM jobs WHERE id = ?".format(self._COLUMNS), (job_id,)).fetchone()
+            return self._row_to_job(row)
+        finally:
+            conn.close()
+
+    def purge(self, older_than: float) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                                  (DONE, FAILED, time.time() - older_than))
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+#########################
+# Accès à la file configurée
+#########################
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> WorkQueue:
+    """Retourne la file de travaux partagée du processus."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SQLiteWorkQueue()
+        return _queue
+
+
+def new_worker_id() -> str:
+    """Identifiant unique d'un worker (nœud et processus)."""
+    return "{}-{}".format(config.NODE_NAME, uuid.uuid4().hex[:8])
@@ -0,0 +1,85 @@
+"""
+Worker de scraping : réclame les travaux de la file partagée et les exécute.
+Autant de nœuds que nécessaire peuvent exécuter ce processus en parallèle :
+    SHOPWISE_WORK_QUEUE_ENABLED=1 python worker.py
+"""
+import logging
+import signal
+import threading
+
+import config
+import work_queue
+from app import do_search, run_price_check
+
+JOB_KINDS = ["search", "price_check"]
+
+
+def run_job(job: work_queue.Job):
+    """Exécute un travail et retourne son résultat (sérialisable en JSON)."""
+    if job.kind == "search":
+        results, degraded = do_search(job.payload["query"])
+        return {"results": results, "degraded": degraded}
+    if job.kind == "price_check":
+        return run_price_check(job.payload.get("product_urls"))
+    raise ValueError("Type de travail inconnu : {}".format(job.kind))
+
+
+def keep_lease(queue: work_queue.WorkQueue, job: work_queue.Job, worker_id: str, done: threading.Event) -> None:
+    """Prolonge le bail du travail tant qu'il s'exécute."""
+    interval = config.WORK_QUEUE_LEASE_SECONDS / 3.0
+    while not done.wait(interval):
+        if not queue.heartbeat(job.id, worker_id):
+            logging.warning("Bail du travail %d perdu par %s.", job.id, worker_id)
+            return
+
+
+def work_loop(queue: work_queue.WorkQueue, stop: threading.Event) -> None:
+    """Boucle d'un slot d'exécution : réclame, exécute et acquitte les travaux jusqu'à l'arrêt."""
+    worker_id = work_queue.new_worker_id()
+    while not stop.is_set():
+        try:
+            job = queue.claim(worker_id, JOB_KINDS)
+        except Exception as e:
+            logging.error("Erreur lors de la réclamation d'un travail: %s", e)
+            job = None
+        if job is None:
+            stop.wait(config.WORK_QUEUE_POLL_SECONDS)
+            continue
+        logging.info("Travail %d (%s, tentative %d) pris par %s.", job.id, job.kind, job.attempts, worker_id)
+        done = threading.Event()
+        threading.Thread(target=keep_lease, args=(queue, job, worker_id, done), daemon=True).start()
+        try:
+            result = run_job(job)
+            queue.complete(job.id, worker_id, result)
+        except Exception as e:
+            logging.error("Erreur lors du travail %d: %s", job.id, e)
+            queue.fail(job.id, worker_id, str(e))
+        finally:
+            done.set()
+
+
+def main() -> None:
+    """Démarre WORKER_CONCURRENCY slots et s'arrête proprement (travaux en cours terminés) sur SIGTERM/SIGINT."""
+    queue = work_queue.get_queue()
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        logging.info("Signal %s reçu, arrêt après les travaux en cours.", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    threads = [threading.Thread(target=work_loop, args=(queue, stop), name="worker-{}".format(i))
+               for i in range(config.WORKER_CONCURRENCY)]
+    for thread in threads:
+        thread.start()
+    logging.info("Worker %s démarré avec %d slots.", config.NODE_NAME, len(threads))
+    # Purge périodique des travaux terminés.
+    while not stop.wait(600):
+        queue.purge(config.WORK_QUEUE_RETENTION_SECONDS)
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
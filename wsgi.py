@@ -0,0 +1,7 @@
+"""
+Point d'entrée WSGI de production.
+Exemple : gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import create_app
+
+application = create_app()